@@ -19,10 +19,13 @@ __geotiff__ = (1, 8, 1)
 import io
 import os
 import sys
-import struct
 import operator
+import weakref
+import threading
+import itertools
+import importlib.util
+import importlib.machinery
 
-import xml.etree.ElementTree as ET
 from typing import IO, AnyStr, Union
 
 __PY3__ = sys.version_info[0] >= 3
@@ -42,10 +45,7 @@ XmpNamespace = dict(
 
 
 class InvalidFileError(Exception):
-    """
-    Raise when the input file is not valid, e.g. not a tiff or jpeg, or is a
-    bigtiff.
-    """
+    "Raise when the input file is not valid, e.g. not a tiff or jpeg."
     pass
 
 
@@ -68,6 +68,9 @@ TYPES = {
     10: ("ll", "RATIONAL"),
     11: ("f",  "FLOAT"),
     12: ("d",  "DOUBLE"),
+    16: ("Q",  "ULONG8"),
+    17: ("q",  "LONG8"),
+    18: ("Q",  "IFD8"),
 }
 
 # assure compatibility python 2 & 3
@@ -82,54 +85,187 @@ else:
     from cStringIO import StringIO
     reduce = __builtins__["reduce"]
 
+#: `xml.etree.ElementTree` module, imported on first XMP access
+ET = None
+
+
+def _etree():
+    "Import `xml.etree.ElementTree` on first need."
+    global ET
+    if ET is None:
+        import xml.etree.ElementTree as ET
+    return ET
+
+
+def _values():
+    "Import `Tyf.values` meaning tables on first need."
+    from Tyf import values
+    return values
+
+
 # here to avoid circular import
-from Tyf import ifd, gkd
+from Tyf import ifd, gkd, source, cache, sidecar, tags as _tags
+
+#: sub IFD pointer tags with the family of the tags they hold
+_SUB_IFDS = {
+    "Exif IFD": "exfT", "GPS IFD": "gpsT", "Interoperability IFD": "itrT"
+}
+#: sub IFD family with the pointer tag locating it
+_POINTERS = dict((family, key) for key, family in _SUB_IFDS.items())
+#: raster offset tags, their values depend on layout as sub IFD pointers do
+_OFFSETS = frozenset(n[1] for n in ifd._RASTERS)
+_LAYOUT_TAGS = _OFFSETS | set(_SUB_IFDS) | {"JPEGInterchangeFormat"}
+#: 8-byte integer types with their 4-byte equivalent
+_LONG4 = {16: 4, 17: 9, 18: 4}
+#: raster offset tags with the tag needed to read data at those offsets
+_RASTER_LENGTHS = {
+    "StripOffsets": "StripByteCounts", "TileOffsets": "TileByteCounts",
+    "FreeOffsets": "FreeByteCounts",
+    "JPEGInterchangeFormat": "JPEGInterchangeFormatLength"
+}
 
 
 def unpack(fmt: str, fileobj: IO[AnyStr]) -> tuple:
-    return struct.unpack(fmt, fileobj.read(struct.calcsize(fmt)))
+    fmt = ifd._struct(fmt)
+    return fmt.unpack(fileobj.read(fmt.size))
 
 
 def pack(fmt: str, fileobj: IO[AnyStr], value: tuple):
-    return fileobj.write(struct.pack(fmt, *value))
+    return fileobj.write(ifd._struct(fmt).pack(*value))
 
 
-def _read_IFD(
-        obj: ifd.Ifd, fileobj: IO[AnyStr],
-        offset: int, byteorder: str = "<") -> int:
-    "Read IFD from file object and return next IFD offset."
-    # fileobj seek must be on the start offset
-    fileobj.seek(offset)
+def _wanted(keys: list) -> frozenset:
+    """
+    Resolve tag numbers or keys into the set of tag numbers to read, adding
+    the pointer tags of sub IFD holding some of them.
+    """
+    wanted = set()
+    for name in keys:
+        tag, (key, typ, default, comment) = _tags.get(name)
+        if tag is False:
+            raise KeyError("%s tag not found" % name)
+        wanted.add(tag)
+        if key in _RASTER_LENGTHS:
+            wanted.add(_tags.get(_RASTER_LENGTHS[key])[0])
+        for pointer, family in _SUB_IFDS.items():
+            if _tags.in_family(key, family):
+                wanted.add(_tags.get(pointer)[0])
+    # interoperability IFD pointer is stored in exif IFD
+    if _tags.get("Interoperability IFD")[0] in wanted:
+        wanted.add(_tags.get("Exif IFD")[0])
+    return frozenset(wanted)
+
+
+def _read_table(
+        obj: ifd.Ifd, src: source.File, offset: int,
+        byteorder: str = "<", wanted: frozenset = None,
+        bigtiff: bool = False) -> tuple:
+    """
+    Read IFD from random access reader and return position and value of next
+    IFD offset. Entry table is read at once, values not stored in entries
+    are fetched from reader on first access. If `wanted` tag number set is
+    given, other entries are skipped.
+    """
+    nb_fmt, entry_fmt, offset_fmt = [
+        ifd._struct(byteorder + fmt) for fmt in ifd._LAYOUTS[bigtiff]
+    ]
+    # guess the table fits in one read and complete it if not
+    table = src.read(offset, ifd._READ_GAP)
     # get number of entry
-    nb_entry, = unpack(byteorder+"H", fileobj)
-    # next ifd offset value is at the end of all entries
-    next_ifd_offset = offset + struct.calcsize("=H" + nb_entry*"HHLL")
+    nb_entry, = nb_fmt.unpack_from(table)
+    size = ifd._ifd_size(nb_entry, bigtiff)
+    if len(table) < size:
+        table = bytes(table) + bytes(
+            src.read(offset + len(table), size - len(table))
+        )
+    # read all entries and the next ifd offset value that follows them
+    end = size - offset_fmt.size
+    next_ifd_offset = offset + end
+    next_ifd, = offset_fmt.unpack_from(table, end)
     # for each entry add new tag to ifd
-    for i in range(nb_entry):
-        obj.append(ifd.Tag.read(fileobj, byteorder))
+    for entry in entry_fmt.iter_unpack(table[nb_fmt.size:end]):
+        if wanted is not None and entry[0] not in wanted:
+            continue
+        tag, _ = ifd.Tag.from_entry(*entry, byteorder=byteorder, source=src)
+        obj._append(tag)
+        if tag.tag is False:
+            print(f"unknown tag {entry[0]} type {tag._types}: {tag} ignored")
+    return next_ifd_offset, next_ifd
+
+
+def _next_IFD(
+        src: source.File, offset: int, byteorder: str = "<",
+        bigtiff: bool = False) -> int:
+    "Return next IFD offset reading only entry count and next IFD offset."
+    nb_fmt, entry_fmt, offset_fmt = [
+        ifd._struct(byteorder + fmt) for fmt in ifd._LAYOUTS[bigtiff]
+    ]
+    nb_entry, = nb_fmt.unpack(src.read(offset, nb_fmt.size))
+    next_ifd, = offset_fmt.unpack(src.read(
+        offset + nb_fmt.size + nb_entry * entry_fmt.size, offset_fmt.size
+    ))
+    return next_ifd
+
+
+def _read_IFD(
+        obj: ifd.Ifd, src: source.File, offset: int,
+        byteorder: str = "<", wanted: frozenset = None,
+        bigtiff: bool = False) -> int:
+    "Read IFD from random access reader and return next IFD offset."
     # return next ifd offset, if =0 then end of TIFF
-    return next_ifd_offset
+    return _read_table(obj, src, offset, byteorder, wanted, bigtiff)[0]
 
 
 def _from_buffer(
-        obj: ifd.Ifd, fileobj: IO[AnyStr],
-        offset: int, byteorder: str = "<") -> int:
-    "Read IFD and sub IFD from file object and return next IFD offset."
+        obj: ifd.Ifd, src: source.File, offset: int,
+        byteorder: str = "<", wanted: frozenset = None,
+        bigtiff: bool = False) -> int:
+    """
+    Read IFD and sub IFD from random access reader and return next IFD. Sub
+    IFD pointers are skipped as other tags if not `wanted` so sub IFD are
+    only read if they hold some wanted tag.
+    """
     # read data from offset and get next ifd offset
-    next_ifd_offset = _read_IFD(obj, fileobj, offset, byteorder)
+    next_ifd = _read_table(obj, src, offset, byteorder, wanted, bigtiff)[-1]
     # read sub IFD if any
-    for key in set(["GPS IFD", "Exif IFD", "Interoperability IFD"]) \
-            & set(obj.keys()):
-        _read_IFD(obj, fileobj, obj[key], byteorder)
-    fileobj.seek(next_ifd_offset)
-    next_ifd, = unpack(byteorder+"L", fileobj)
+    for key in set(_SUB_IFDS) & set(obj.keys()):
+        _read_IFD(obj, src, obj[key], byteorder, wanted, bigtiff)
     return next_ifd
 
 
-def _write_IFD(
-        obj: ifd.Ifd, fileobj: IO[AnyStr], offset: int,
-        byteorder: str = "<", ifd1: ifd.Ifd = None):
-    "Write IFD in file object and return next ifd offset."
+def _fit_types(obj: ifd.Ifd, bigtiff: bool = False) -> None:
+    """
+    Set types of offset tags according to layout (LONG8 and IFD8 for BigTIFF,
+    LONG else, SHORT raster offsets included) and convert 8-byte integer tags
+    for TIFF layout. Sub IFD pointers are created if missing. This is done
+    before packing so packed sizes do not change when offset values are set.
+    """
+    for key, family in _SUB_IFDS.items():
+        if hasattr(obj, family) and key not in dict.keys(obj):
+            tag = ifd.Tag(key)
+            tag.value = 0
+            dict.__setitem__(obj, key, tag)
+    for tag in list(obj):
+        if bigtiff and tag.key in _SUB_IFDS:
+            typ = 18
+        elif tag.key in _OFFSETS:
+            # SHORT offsets may not hold new raster positions
+            typ = 16 if bigtiff else 4
+        else:
+            typ = _LONG4.get(tag.type, tag.type) if not bigtiff else tag.type
+        if typ != tag.type:
+            value = tag.value
+            tag.type = typ
+            tag.value = value
+
+
+def _prepare_IFD(obj: ifd.Ifd, bigtiff: bool = False, raster: bool = True):
+    """
+    Fix tag types and counts so packed IFD sizes do not change anymore when
+    offset values are set: offset tag types (see `_fit_types`), GeoTIFF keys
+    and raster offset counts, one per block.
+    """
+    _fit_types(obj, bigtiff)
     # compute geotiff ifd if any found
     geokey = gkd.Gkd.from_ifd(obj)
     if len(geokey):
@@ -137,113 +273,150 @@ def _write_IFD(
         obj["GeoKeyDirectoryTag"] = geokey._34735
         obj["GeoDoubleParamsTag"] = geokey._34736
         obj["GeoAsciiParamsTag"] = geokey._34737
+    for tag in [t for t in _OFFSETS if raster and t in dict.keys(obj)]:
+        bytecounts = obj[tag.replace("Offsets", "ByteCounts")]
+        count = len(bytecounts) if isinstance(bytecounts, tuple) else 1
+        if dict.__getitem__(obj, tag).count != count:
+            obj[tag] = (0,) * count
 
-    # pack the ifd
-    ifds = obj.pack(byteorder)
-    if isinstance(ifd1, ifd.Ifd):
-        ifds.update(ifd1=ifd1.pack(byteorder)["root"])
-
-    # compute exif, gps and interoperability offsets
-    ifd_size = ifds["root"]["size"]
-    ifd_values = ifds["root"]["data"]
-
-    # where to put ifd values
-    ifd_offset_values = offset + ifd_size
-    # where to put the sub ifds
-    sub_ifd_offset = ifd_offset_values + len(ifd_values)
-
-    # compute all possible sub ifd offsets
-    for name in [n for n in ["exfT", "gpsT", "itrT"] if n in ifds]:
-        i = ifds[name]
-        tag = \
-            "Exif IFD" if name == "exfT" else \
-            "GPS IFD" if name == "gpsT" else \
-            "Interoperability IFD"
-        obj[tag] = sub_ifd_offset
-        # increment the next sub ifd offset
-        sub_ifd_offset += i["size"] + len(i["data"])
-
-    # if ifd1 given (thumbnail jor Jpeg), reserve needed space before raster
-    # data
-    if "ifd1" in ifds:
-        raster_offset = \
-            sub_ifd_offset + ifds["ifd1"]["size"] + \
-            len(ifds["ifd1"]["data"]) + ifds["ifd1"]["raster"]
-    # else raster data can follow the last sub ifd
+
+def _plan_IFD(
+        obj: ifd.Ifd, offset: int, byteorder: str = "<",
+        bigtiff: bool = False) -> tuple:
+    """
+    Place IFD and sub IFD written from `offset` and set sub IFD pointers.
+    Entries are packed once, except the ones holding offsets whose values
+    are set by the layout: their packed size is known from their count.
+    Return `(tables, end)` where `tables` lists `(name, entry table offset,
+    values offset, entries)` in writing order, entries being sorted
+    `(tag, packed)` pairs with `packed` left to `None` for offset tags.
+    """
+    field = ifd._struct("=" + ifd._LAYOUTS[bigtiff][-1]).size
+    tables = []
+    for name in ["root"] + [
+        n for n in ["exfT", "gpsT", "itrT"] if hasattr(obj, n)
+    ]:
+        if name == "root":
+            table = obj
+        else:
+            table = getattr(obj, name)
+            obj[_POINTERS[name]] = offset
+        entries, size = [], 0
+        for tag in sorted(table.values(), key=lambda e: e.tag):
+            if tag.key in _LAYOUT_TAGS:
+                packed, length = None, tag.calcsize()
+            else:
+                packed = tag.pack(byteorder, bigtiff)
+                length = len(packed[1])
+            if length > field:
+                size += length
+            entries.append((tag, packed))
+        values = offset + ifd._ifd_size(len(entries), bigtiff)
+        tables.append((name, offset, values, entries))
+        offset = values + size
+    return tables, offset
+
+
+def _raster_size(obj: ifd.Ifd) -> int:
+    "Return raster data size of an IFD."
+    if "JPEGInterchangeFormatLength" in obj:
+        return obj["JPEGInterchangeFormatLength"]
+    return sum(n for o, n in ifd._raster_blocks(obj)[-1])
+
+
+def _write_IFD(
+        obj: ifd.Ifd, fileobj: IO[AnyStr], offset: int,
+        byteorder: str = "<", ifd1: ifd.Ifd = None,
+        bigtiff: bool = False, src: source.File = None, raster: bool = True,
+        plan: tuple = None):
+    """
+    Write IFD in file object and return next ifd offset. If raster is not
+    loaded, it is copied from `src` reader without loading it. If `raster` is
+    `False`, raster offsets are left as is and no raster data is written.
+    All offsets are planned from value sizes first, so IFD is packed once
+    and written with its sub IFD in a single write. `plan` is the
+    `_plan_IFD` result of an already prepared IFD.
+    """
+    nb_fmt, _, offset_fmt = [
+        ifd._struct(byteorder + fmt) for fmt in ifd._LAYOUTS[bigtiff]
+    ]
+    # raster ranges are read from tags before new offsets are set
+    if obj.raster_loaded or src is None or not raster:
+        blocks = ()
+    elif "JPEGInterchangeFormat" in obj:
+        blocks = ((
+            obj["JPEGInterchangeFormat"], obj["JPEGInterchangeFormatLength"]
+        ), )
     else:
-        raster_offset = sub_ifd_offset
+        blocks = ifd._raster_blocks(obj)[-1]
+    # source offsets are restored once written
+    backup = dict(
+        (key, obj[key]) for key in ["JPEGInterchangeFormat"] +
+        [n[1] for n in ifd._RASTERS] if blocks and key in dict.keys(obj)
+    )
+    if plan is None:
+        _prepare_IFD(obj, bigtiff, raster)
+        plan = _plan_IFD(obj, offset, byteorder, bigtiff)
+    tables, raster_offset = plan
+    # IFD1 (JPEG thumbnail) and its raster are put before raster data
+    if isinstance(ifd1, ifd.Ifd):
+        _prepare_IFD(ifd1, bigtiff)
+        ifd1_offset = raster_offset
+        ifd1_plan = _plan_IFD(ifd1, ifd1_offset, byteorder, bigtiff)
+        raster_offset = ifd1_plan[-1] + _raster_size(ifd1)
 
-    # compute raster positions
+    # set raster positions
     for tag in [
         t for t in
         ["StripOffsets", "TileOffsets", "FreeOffsets", "JPEGInterchangeFormat"]
-        if t in dict.keys(obj)
+        if raster and t in dict.keys(obj)
     ]:
         if "Offset" in tag:  # StripOffsets, TileOffsets or FreeOffsets
-            raster_offsets = (raster_offset,)
-            tagname = tag.replace("Offsets", "ByteCounts")
-            bytecounts = obj[tagname]
+            bytecounts = obj[tag.replace("Offsets", "ByteCounts")]
             if isinstance(bytecounts, tuple):
-                for bytecount in obj[tagname]:
-                    raster_offsets += (raster_offsets[-1] + bytecount, )
-            obj[tag] = raster_offsets
+                # one offset per block: last bytecount only gives file end
+                obj[tag] = tuple(itertools.accumulate(
+                    bytecounts[:-1], initial=raster_offset
+                ))
+            else:
+                obj[tag] = (raster_offset,)
         else:  # JPEGInterchangeFormat
             obj[tag] = raster_offset
 
-    # recompute all modified tags
-    ifds = obj.pack(byteorder)
-    if isinstance(ifd1, ifd.Ifd):
-        ifds.update(ifd1=ifd1.pack(byteorder)["root"])
-    # adjust raser offset with diff between first computation and second one
-    raster_offset += len(ifds["root"]["data"]) - len(ifd_values)
-
-    # write IFDs
-    for key in [
-        k for k in ["root", "exfT", "gpsT", "itrT"]
-        if k in ifds
-    ]:
-        packed = ifds[key]
-        # go to according [SUB]IFD offset and determine associated data offset
-        if key == "root":
-            fileobj.seek(offset)
-            data_offset = ifd_offset_values
-        else:
-            sub_ifd_offset = obj[
-                "Exif IFD" if key == "exfT" else
-                "GPS IFD" if key == "gpsT" else
-                "Interoperability IFD"
-            ]
-            fileobj.seek(sub_ifd_offset)
-            data_offset = \
-                sub_ifd_offset + packed["size"]
-
-        tags = packed["tags"]
-        # write number of entries
-        pack(byteorder+"H", fileobj, (len(tags),))
-        # write all ifd entries and data
-        for entry, data, is_offset in tags:
-            fileobj.write(entry)
+    # all values are known: emit IFD and sub IFD in a single write
+    chunks = []
+    for name, table_offset, data_offset, entries in tables:
+        chunks.append(nb_fmt.pack(len(entries)))
+        values = []
+        for tag, packed in entries:
+            entry, data, is_offset = packed or tag.pack(byteorder, bigtiff)
+            chunks.append(entry)
             if not is_offset:
-                fileobj.write(data)
+                chunks.append(data)
             else:
                 # put offset and shift it by len(data) for next offset value
-                pack(byteorder+"L", fileobj, (data_offset, ))
+                chunks.append(offset_fmt.pack(data_offset))
                 data_offset += len(data)
-
-        if key == "root":
-            next_ifd_offset = fileobj.tell()
-        pack(byteorder+"L", fileobj, (0, ))
-        fileobj.write(packed["data"])
+                values.append(data)
+        chunks.append(offset_fmt.pack(
+            ifd1_offset if name == "root" and isinstance(ifd1, ifd.Ifd)
+            else 0
+        ))
+        chunks.extend(values)
+    # next IFD offset is written just before root values
+    next_ifd_offset = tables[0][2] - offset_fmt.size
+    fileobj.seek(offset)
+    fileobj.write(b"".join(chunks))
 
     # write IFD1 (this should only be used with Jpeg exif thumbnail)
-    if "ifd1" in ifds:
-        ifd1_offset = fileobj.tell()
-        fileobj.seek(next_ifd_offset)
-        pack(byteorder+"L", fileobj, (ifd1_offset, ))
-        _write_IFD(ifd1, fileobj, ifd1_offset, byteorder="<", ifd1=None)
+    if isinstance(ifd1, ifd.Ifd):
+        _write_IFD(
+            ifd1, fileobj, ifd1_offset, byteorder, ifd1=None,
+            bigtiff=bigtiff, plan=ifd1_plan
+        )
 
     # write raster data
-    if obj.raster_loaded:
+    if obj.raster_loaded and raster:
         fileobj.seek(raster_offset)
         if hasattr(obj, "jpegIF"):
             fileobj.write(getattr(obj, "jpegIF"))
@@ -255,10 +428,94 @@ def _write_IFD(
                 ]
             ):
                 fileobj.write(data)
+    # or copy it from source without loading it
+    elif blocks:
+        fileobj.seek(raster_offset)
+        # blocks following each other in source are copied at once
+        ranges = []
+        for block_offset, bytecount in blocks:
+            if ranges and ranges[-1][0] + ranges[-1][1] == block_offset:
+                ranges[-1][1] += bytecount
+            else:
+                ranges.append([block_offset, bytecount])
+        for block_offset, bytecount in ranges:
+            source.Slice(src, block_offset, bytecount).copy(fileobj)
+        for key, value in backup.items():
+            obj[key] = value
 
     return next_ifd_offset
 
 
+def _footprint(
+        src: source.File, offset: int, byteorder: str = "<",
+        bigtiff: bool = False) -> list:
+    """
+    Return sorted `(start, stop)` byte ranges used by IFD found at `offset`:
+    entry tables of IFD and sub IFD and values not stored in entries.
+    """
+    nb_fmt, entry_fmt, offset_fmt = [
+        ifd._struct(byteorder + fmt) for fmt in ifd._LAYOUTS[bigtiff]
+    ]
+    pointers = set(_tags.get(key)[0] for key in _SUB_IFDS)
+    ranges, tables, seen = [], [offset], set()
+    while tables:
+        start = tables.pop()
+        seen.add(start)
+        nb_entry, = nb_fmt.unpack(src.read(start, nb_fmt.size))
+        ranges.append((start, start + ifd._ifd_size(nb_entry, bigtiff)))
+        table = src.read(start + nb_fmt.size, nb_entry * entry_fmt.size)
+        for tag, typ, cnt, value in entry_fmt.iter_unpack(table):
+            if typ not in ifd.TYPES:
+                continue
+            fmt = ifd._value_struct(byteorder, typ, cnt)
+            if fmt.size > len(value):
+                value_offset, = offset_fmt.unpack(value)
+                ranges.append((value_offset, value_offset + fmt.size))
+            elif tag in pointers:
+                pointer = fmt.unpack_from(value)[0]
+                if pointer and pointer not in seen:
+                    tables.append(pointer)
+    return sorted(ranges)
+
+
+def _write_header(
+        fileobj: IO[AnyStr], byteorder: str = "<", bigtiff: bool = False,
+        first_ifd: int = 0) -> int:
+    """
+    Write TIFF or BigTIFF header and return position of first IFD offset.
+    """
+    if bigtiff:
+        pack(
+            byteorder+"HHHH", fileobj,
+            (0x4949 if byteorder == "<" else 0x4d4d, 0x2B, 8, 0)
+        )
+    else:
+        pack(
+            byteorder+"HH", fileobj,
+            (0x4949 if byteorder == "<" else 0x4d4d, 0x2A, )
+        )
+    pointer = fileobj.tell()
+    pack(byteorder + ifd._LAYOUTS[bigtiff][-1], fileobj, (first_ifd,))
+    return pointer
+
+
+def _layout_size(ifds: list) -> int:
+    """
+    Return an upper bound of file size needed to write IFDs with their sub
+    IFD, values and raster data using BigTIFF layout.
+    """
+    size = 16
+    for obj in [i for i in ifds if isinstance(i, ifd.Ifd)]:
+        tags = list(obj)
+        # each IFD and sub IFD has a count, entries and next IFD offset
+        size += ifd._ifd_size(len(tags), True) + 3 * ifd._ifd_size(0, True)
+        size += sum(t.calcsize() for t in tags)
+        if "JPEGInterchangeFormatLength" in obj:
+            size += obj["JPEGInterchangeFormatLength"]
+        size += sum(n for o, n in ifd._raster_blocks(obj)[-1])
+    return size
+
+
 def _fileobj(f: Union[str, IO[AnyStr]], mode: str) -> tuple:
     #: returns fileobj from a path or a stringIO
     if hasattr(f, "close"):
@@ -270,13 +527,37 @@ def _fileobj(f: Union[str, IO[AnyStr]], mode: str) -> tuple:
     return fileobj, _close
 
 
+def _same_file(f: Union[str, IO[AnyStr]], path: str) -> bool:
+    #: returns True if f is a path or a file object bound to path
+    name = getattr(f, "name", f)
+    try:
+        return os.path.samefile(name, path)
+    except (TypeError, ValueError, OSError):
+        return False
+
+
 class TiffFile(list):
     """
     This class is is a list of all Image File Directories defining the TIFF
-    file.
+    file. When opened from a file path, IFD are parsed on first access and
+    only the IFD chain needed is followed. Parsed IFD are kept in a bounded
+    cache, edited ones are never dropped and IFD still referenced elsewhere
+    are returned as is. Any list modification parses all IFD and makes it a
+    plain list.
 
     Args:
         fileobj (IO[AnyStr]): a python file object.
+        mmap (bool): memory-map the file so raster data (`stripes`, `tiles`
+            and `free` attributes) are exposed as `memoryview` slices of the
+            map, without copy.
+        tags (list): tag numbers or keys to read, other tags are skipped and
+            sub IFD are read only if they hold some of them. Instance is
+            then meant to read metadata, not to be saved.
+        cache_size (int): number of parsed IFD kept in memory.
+        index (bool): use sidecar index file if a valid one exists (see
+            `Tyf.sidecar`).
+        block_cache (int): size in bytes of the cache shared by all IFD to
+            keep strips and tiles read one by one.
 
     ```python
     >>> tif = Tyf.open("test/CEA.tif")
@@ -306,51 +587,204 @@ class TiffFile(list):
         None, None, "True if all raster data loaded"
     )
 
-    def __init__(self, fileobj: IO[AnyStr]) -> None:
+    def __init__(
+            self, fileobj: IO[AnyStr], mmap: bool = False,
+            tags: list = None, cache_size: int = 128,
+            index: bool = True, block_cache: int = 64 << 20) -> None:
         # determine byteorder
         first, = unpack(">H", fileobj)
         byteorder = "<" if first == 0x4949 else ">"
         # manage according to magic number found
         magic_number, = unpack(byteorder+"H", fileobj)
-        if magic_number not in [0x732E, 0x2A]:  # 29486, 42
+        if magic_number not in [0x732E, 0x2A, 0x2B]:  # 29486, 42, 43
             fileobj.close()
-            if magic_number == 0x2B:  # 43
-                raise InvalidFileError("BigTIFF file not supported")
-            else:
-                raise InvalidFileError(
-                    "Bad magic number. Not a valid TIFF file"
-                )
+            raise InvalidFileError("Bad magic number. Not a valid TIFF file")
 
-        ifds = []
-        next_ifd, = unpack(byteorder+"L", fileobj)
-        while next_ifd != 0:
-            i = ifd.Ifd(tag_family=["bTT", "pTT", "xTT"])
-            next_ifd = _from_buffer(i, fileobj, next_ifd, byteorder)
-            ifds.append(i)
-
-        # keep filename source to load raster when needed
-        if hasattr(fileobj, "name"):
-            self._filename = fileobj.name
-        # load raster if initializing from fileobj
+        #: `True` if file is a BigTIFF one (64-bit offsets)
+        self.bigtiff = magic_number == 0x2B
+        if self.bigtiff:
+            offset_size, _, next_ifd = unpack(byteorder+"HHQ", fileobj)
+            if offset_size != 8:
+                fileobj.close()
+                raise InvalidFileError("Bad BigTIFF offset size")
         else:
-            for i in ifds:
-                ifd._load_raster(i, fileobj)
+            next_ifd, = unpack(byteorder+"L", fileobj)
+        # values and raster are fetched later from this reader
+        self._source = source.from_fileobj(fileobj, map=mmap)
+        self._byteorder = byteorder
+        self._wanted = None if tags is None else _wanted(tags)
+        # IFD chain known so far
+        self._offsets, self._seen, self._complete = [], set(), False
+        self._chain(next_ifd)
+        #: sidecar index content if a valid one was found (see `Tyf.sidecar`)
+        self.index = None
+        if index and isinstance(self._source, source.File):
+            found = sidecar.load(self._source.path)
+            if found is not None and \
+               (found[0] if len(found) else 0) == next_ifd \
+               and found.header["bigtiff"] == self.bigtiff \
+               and found.header["byteorder"] == byteorder:
+                # IFD offsets are read from index when needed
+                self.index = self._offsets = found
+                self._complete = True
+        self._pages = cache.LRU(cache_size, evict=_edited_page)
+        # pages evicted from cache but still referenced by caller
+        self._alive = weakref.WeakValueDictionary()
+        #: raster blocks read by `Tyf.ifd.Ifd.read_strip` and `read_tile`,
+        #: not used with memory-mapped file as blocks are not copied
+        self.block_cache = None if isinstance(self._source, source.Map) \
+            else cache.LRU(block_cache, sizeof=len)
+        self._lock = threading.RLock()
+        self._lazy = True
+
+        # keep filename source to parse IFD and load raster when needed
+        if isinstance(self._source, source.File):
+            self._filename = self._source.path
+            self._source.close()
+            list.__init__(self)
+        # parse all and load raster if initializing from fileobj
+        else:
+            self._materialize()
+            for i in self:
+                ifd._load_raster(i, self._source)
+
+    def _chain(self, next_ifd: int) -> None:
+        # add next IFD offset to the chain, a loop ends the chain
+        if next_ifd == 0 or next_ifd in self._seen:
+            self._complete = True
+        else:
+            self._offsets.append(next_ifd)
+            self._seen.add(next_ifd)
+
+    def _walk(self, index: int = None) -> None:
+        "Follow IFD chain until `index` IFD offset is known or up to its end."
+        with self._lock:
+            while not self._complete and \
+                    (index is None or index >= len(self._offsets)):
+                self._chain(_next_IFD(
+                    self._source, self._offsets[-1], self._byteorder,
+                    self.bigtiff
+                ))
+
+    def _page(self, index: int) -> ifd.Ifd:
+        "Return IFD `index` from cache or parse it."
+        with self._lock:
+            page = self._pages.get(index)
+            if page is None:
+                # edits made through a held reference must not be lost
+                page = self._alive.get(index)
+                if page is not None:
+                    self._pages[index] = page
+            if page is None:
+                page = ifd.Ifd(tag_family=["bTT", "pTT", "xTT"])
+                next_ifd = _from_buffer(
+                    page, self._source, self._offsets[index],
+                    self._byteorder, self._wanted, self.bigtiff
+                )
+                page._source, page._blocks = self._source, self.block_cache
+                page._byteorder = self._byteorder
+                if index == len(self._offsets) - 1 and not self._complete:
+                    self._chain(next_ifd)
+                self._pages[index] = page
+                self._alive[index] = page
+            return page
+
+    def _materialize(self) -> None:
+        "Parse all IFD and store them as list items."
+        with self._lock:
+            if self._lazy:
+                self._walk()
+                pages = [self._page(i) for i in range(len(self._offsets))]
+                list.__init__(self, pages)
+                self._lazy = False
+                self._pages.clear()
+                self._alive.clear()
+
+    def __len__(self) -> int:
+        if self._lazy:
+            self._walk()
+            return len(self._offsets)
+        return list.__len__(self)
+
+    def __getitem__(self, item: Union[int, slice]) -> ifd.Ifd:
+        if not self._lazy:
+            return list.__getitem__(self, item)
+        if isinstance(item, slice):
+            return [self._page(i) for i in range(*item.indices(len(self)))]
+        index = operator.index(item)
+        if index < 0:
+            index += len(self)
+        self._walk(index)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError("list index out of range")
+        return self._page(index)
+
+    def __iter__(self):
+        if not self._lazy:
+            return list.__iter__(self)
+        return self._iter()
+
+    def _iter(self):
+        index = 0
+        while True:
+            self._walk(index)
+            if index >= len(self._offsets) or not self._lazy:
+                break
+            yield self._page(index)
+            index += 1
+        # materialized while iterating
+        if not self._lazy:
+            for page in list.__getitem__(self, slice(index, None)):
+                yield page
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release the file handle used to fetch tag values and raster data. It
+        is opened again if needed.
+        """
+        self._source.close()
+        if self.index is not None:
+            self.index.close()
 
-        list.__init__(self, ifds)
+    def load_raster(self, idx: int = None, contiguous: bool = False) -> None:
+        """
+        Load raster data of all IFD or of IFD `idx` only. Neighbouring blocks
+        are read at once and sliced without copy.
 
-    def load_raster(self, idx: int = None) -> None:
-        if hasattr(self, "_filename"):
-            in_, c_ = _fileobj(self._filename, "rb")
-            for item in iter(self) if idx is None else [self[idx]]:
-                if not item.raster_loaded:
-                    ifd._load_raster(item, in_)
-            in_.close()
+        Arguments:
+            idx (int): IFD index to load
+            contiguous (bool): read blocks of each IFD in a single `bytearray`
+                stored as `raster` attribute, blocks being slices of it
+                (meant for uncompressed data)
+        """
+        if idx is None:
+            # loaded raster must not be evicted with their IFD
+            self._materialize()
+        for item in iter(self) if idx is None else [self[idx]]:
+            if not item.raster_loaded or \
+               contiguous and not hasattr(item, "raster"):
+                ifd._load_raster(item, self._source, contiguous)
+        self._source.close()
 
     def save(
             self, f: Union[str, IO[AnyStr]], byteorder: str = "<",
-            idx: int = None, ifd1: ifd.Ifd = None) -> None:
+            idx: int = None, ifd1: ifd.Ifd = None,
+            bigtiff: bool = None, compression: int = None,
+            predictor: int = 1, workers=None) -> None:
         """
-        Save object into a buffer.
+        Save object into a buffer. Raster data not loaded are copied from
+        source file without going through memory (see `Tyf.source.File.copy`),
+        except when saving over it.
 
         Arguments:
             f (str|IO[AnyStr]): a valid file path or a python file object
@@ -358,23 +792,380 @@ class TiffFile(list):
             idx (int): IFD index to save
             ifd1 (ifd.Ifd): IFD to be used as thumbnail (only needed with
                 JPEG saving)
+            bigtiff (bool): write a BigTIFF file. If `None`, BigTIFF is
+                used only if the file would not fit 32-bit offsets.
+            compression (int): if given, raster of saved IFD are encoded
+                again before writing, saved instance being left unchanged
+                (see `Tyf.ifd.Ifd.compress`)
+            predictor (int): `Predictor` tag value used with `compression`
+            workers (int|concurrent.futures.Executor): thread count or pool
+                encoding raster blocks
+
+        Raises:
+            ValueError: if instance was opened with `tags` filter.
         """
-        self.load_raster()
+        if self._wanted is not None:
+            raise ValueError("IFD partially read, they cannot be saved")
+        path = getattr(self._source, "path", None)
+        overwrite = path is None or _same_file(f, path)
+        if overwrite:
+            self.load_raster(idx)
+        ifds = list(self) if idx is None else [self[idx]]
+        if overwrite:
+            # memory-mapped blocks would be read while being overwritten
+            for i in ifds:
+                ifd._own_raster(i)
+        # layout fixes made while writing are not edits of unchanged pages
+        clean = [i for i in ifds if not ifd._is_dirty(i)]
+        if compression is not None:
+            # pages are encoded again for the output only
+            ifds = [ifd._copy(i, raster=True) for i in ifds]
+            for i in ifds:
+                i.compress(compression, predictor, workers)
+        # fetch all values before `f` is opened: it may be the source file
+        for i in ifds:
+            ifd._load_values(i)
+        if isinstance(ifd1, ifd.Ifd):
+            ifd._load_values(ifd1)
+        if bigtiff is None:
+            bigtiff = _layout_size(ifds + [ifd1]) > 0xFFFFFFFF
         fileobj, _close = _fileobj(f, "wb")
+        offset_fmt = byteorder + ifd._LAYOUTS[bigtiff][-1]
+        # position of the offset pointing to next IFD
+        pointer = _write_header(fileobj, byteorder, bigtiff)
+
+        for i in ifds:
+            # next IFD is written at the end of file
+            fileobj.seek(0, 2)
+            next_ifd = fileobj.tell()
+            fileobj.seek(pointer)
+            pack(offset_fmt, fileobj, (next_ifd,))
+            pointer = _write_IFD(
+                i, fileobj, next_ifd, byteorder, ifd1=ifd1,
+                bigtiff=bigtiff, src=self._source
+            )
+        for i in clean:
+            ifd._clean(i)
+        self._source.close()
 
-        pack(
-            byteorder+"HH", fileobj,
-            (0x4949 if byteorder == "<" else 0x4d4d, 0x2A, )
+        if _close:
+            fileobj.close()
+            del fileobj
+
+    def update_in_place(self) -> None:
+        """
+        Write edited IFD back into source file without rewriting raster
+        data. Only IFD with tags set, added or removed since they were read
+        are serialized. An IFD is overwritten where it was if it still fits
+        in the bytes used by its entries, sub IFD and values, else it is
+        appended at end of file and the offset pointing to it is patched.
+
+        ```python
+        >>> tif = Tyf.open("test/CEA.tif")
+        >>> tif[0]["Copyright"] = "THOORENS Bruno"
+        >>> tif.update_in_place()
+        ```
+
+        Raises:
+            ValueError: if IFD list or raster data changed, if instance was
+                opened with `tags` filter or not from a file path, or if a
+                classic TIFF file would need 64-bit offsets.
+        """
+        path = getattr(self._source, "path", None)
+        if path is None:
+            raise ValueError("in place update needs a file path")
+        if self._wanted is not None:
+            raise ValueError("IFD partially read, they cannot be updated")
+        with self._lock:
+            if self._lazy:
+                # pages neither cached nor referenced were never edited
+                edited = sorted(
+                    (index, page) for index, page in self._alive.items()
+                    if ifd._is_dirty(page)
+                )
+            else:
+                if list.__len__(self) != len(self._offsets) or \
+                   any(getattr(i, "_source", None) is not self._source
+                       for i in self):
+                    raise ValueError("IFD list changed, use save instead")
+                edited = [
+                    (index, page) for index, page in enumerate(self)
+                    if ifd._is_dirty(page)
+                ]
+            if not edited:
+                return
+            byteorder, bigtiff = self._byteorder, self.bigtiff
+            offset_fmt = byteorder + ifd._LAYOUTS[bigtiff][-1]
+            if self.index is not None:
+                # file modification invalidates sidecar index anyway
+                self.index.close()
+                self.index, self._offsets = None, list(self._offsets)
+            src = self._source
+            updates = []
+            for index, page in edited:
+                offset = self._offsets[index]
+                original = ifd.Ifd(tag_family=["bTT", "pTT", "xTT"])
+                next_ifd = _from_buffer(
+                    original, src, offset, byteorder, None, bigtiff
+                )
+                if any(
+                    (key in original and original[key]) !=
+                    (key in page and page[key])
+                    for key in itertools.chain(*_RASTER_LENGTHS.items())
+                ):
+                    raise ValueError(
+                        "raster of IFD %d changed, use save instead" % index
+                    )
+                ifd._load_values(original)
+                ifd._load_values(page)
+                # IFD serialized at offset 0 gives its size and tells if
+                # anything has to be written
+                packed = []
+                for obj in (page, original):
+                    buffer = StringIO()
+                    _write_IFD(
+                        obj, buffer, 0, byteorder, bigtiff=bigtiff,
+                        raster=False
+                    )
+                    packed.append(buffer.getvalue())
+                if packed[0] != packed[-1]:
+                    updates.append((
+                        index, page, offset, next_ifd, packed[0],
+                        _footprint(src, offset, byteorder, bigtiff)
+                    ))
+
+            with io.open(path, "r+b") as fileobj:
+                for index, page, offset, next_ifd, packed, ranges in updates:
+                    start, stop = ranges[0]
+                    for begin, end in ranges[1:]:
+                        # one padding byte may align next item on a word
+                        if begin > stop + 1:
+                            start = None
+                            break
+                        stop = max(stop, end)
+                    blocks = ifd._raster_blocks(page)[-1]
+                    if start is not None and any(
+                        o < stop and o + n > start for o, n in blocks
+                    ):
+                        start = None
+                    if start is not None:
+                        start += start % 2
+                    if start is None or start + len(packed) > stop:
+                        fileobj.seek(0, 2)
+                        start = fileobj.tell()
+                        start += start % 2
+                        stop = start + len(packed)
+                    if not bigtiff and stop > 0xFFFFFFFF:
+                        raise ValueError(
+                            "IFD %d would need a BigTIFF file" % index
+                        )
+                    pointer = _write_IFD(
+                        page, fileobj, start, byteorder, bigtiff=bigtiff,
+                        raster=False
+                    )
+                    fileobj.seek(pointer)
+                    pack(offset_fmt, fileobj, (next_ifd,))
+                    # clear bytes left from previous IFD
+                    fileobj.seek(0, 2)
+                    end = min(stop, fileobj.tell())
+                    fileobj.seek(start + len(packed))
+                    fileobj.write(bytes(max(0, end - start - len(packed))))
+                    if start != offset:
+                        if index == 0:
+                            pointer = 8 if bigtiff else 4
+                        else:
+                            # previous IFD may have been written just before
+                            previous = self._offsets[index - 1]
+                            fileobj.seek(previous)
+                            nb_entry, = unpack(
+                                byteorder + ifd._LAYOUTS[bigtiff][0], fileobj
+                            )
+                            pointer = previous + ifd._ifd_size(
+                                nb_entry, bigtiff
+                            ) - ifd._struct(offset_fmt).size
+                        fileobj.seek(pointer)
+                        pack(offset_fmt, fileobj, (start,))
+                        self._offsets[index] = start
+                        self._seen.discard(offset)
+                        self._seen.add(start)
+            for index, page in edited:
+                ifd._clean(page)
+                if self._lazy:
+                    self._pages.unpin(index)
+            # a memory map has to be created again to see appended bytes
+            src.close()
+
+
+def _edited_page(index: int, page: ifd.Ifd) -> bool:
+    # parsed IFD is kept when evicted if something was edited since parsing
+    return ifd._is_dirty(page)
+
+
+def _materialized(name: str):
+    "Return `list` method `name` applied once all TiffFile IFD are parsed."
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# list methods using list items directly
+for _name in [
+    "__setitem__", "__delitem__", "__iadd__", "__imul__", "__add__",
+    "__mul__", "__rmul__", "__contains__", "__eq__", "__ne__", "__lt__",
+    "__le__", "__gt__", "__ge__", "__repr__", "append", "extend", "insert",
+    "pop", "remove", "clear", "reverse", "sort", "index", "count", "copy"
+]:
+    setattr(TiffFile, _name, _materialized(_name))
+del _name
+
+
+class TiffWriter(object):
+    """
+    Streaming TIFF writer. Raster blocks of the IFD defined by `template`
+    are written to disk as soon as they are given, in any order, so peak
+    memory is about one block. The IFD is written at close with block
+    offsets and byte counts.
+
+    ```python
+    >>> tif = Tyf.open("test/CEA.tif")
+    >>> with Tyf.TiffWriter("CEA_copy.tif", tif[0]) as writer:
+    ...     for i in reversed(range(len(writer))):
+    ...         writer.write_block(i, tif[0].read_strip(i))
+    ```
+
+    Arguments:
+        f (str|IO[AnyStr]): a valid file path or a python file object
+        template (ifd.Ifd): IFD with raster size and layout tags
+            (`ImageWidth`, `ImageLength`, `RowsPerStrip` or `TileWidth` and
+            `TileLength`...). It is copied as `ifd` attribute where raster
+            offsets and byte counts are set at close.
+        byteorder (string): `">"` if big-endian used else `"<"`
+        bigtiff (bool): write a BigTIFF file. If `None`, BigTIFF is used
+            only if the file would not fit 32-bit offsets.
+    """
+
+    def __init__(
+            self, f: Union[str, IO[AnyStr]], template: ifd.Ifd,
+            byteorder: str = "<", bigtiff: bool = None) -> None:
+        # template values may come from a file about to be overwritten
+        ifd._load_values(template)
+        name, samples, planar, bwidth, blength, across, down = \
+            ifd._raster_geometry(template)
+        self.ifd = ifd._copy(template)
+        self.byteorder = byteorder
+        self.bigtiff = bigtiff
+        self._name = name
+        self._blocks = [None] * (
+            across * down * (samples if planar else 1)
         )
-        next_ifd = 8
+        self._fileobj, self._close = _fileobj(f, "wb")
+        # header is written at close, room is left for a BigTIFF one
+        self._fileobj.write(bytes(16))
+        self._end = 16
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._fileobj is not None:
+            # unfinished file is left without IFD
+            if self._close:
+                self._fileobj.close()
+            self._fileobj = None
+
+    def write_block(self, index: int, data: bytes, encode: bool = False):
+        """
+        Write a strip or a tile at the end of file. A block written twice
+        is referenced by its last data.
 
-        for i in iter(self) if idx is None else [self[idx]]:
-            pack(byteorder+"L", fileobj, (next_ifd,))
-            next_ifd = _write_IFD(i, fileobj, next_ifd, byteorder, ifd1=ifd1)
+        Arguments:
+            index (int): strip index or tile index, row by row from top left
+                tile
+            data (bytes): block data
+            encode (bool): compress data according to template
+                `Compression` and `Predictor` tags (see `Tyf.compression`)
+        """
+        if self._fileobj is None:
+            raise ValueError("writer is closed")
+        if not 0 <= index < len(self._blocks):
+            raise IndexError("block index out of range")
+        if encode:
+            data = ifd._compression.encode(data, **dict(
+                ifd._codec_args(self.ifd), byteorder=self.byteorder
+            ))
+        self._fileobj.seek(self._end)
+        self._fileobj.write(data)
+        self._blocks[index] = (self._end, len(data))
+        self._end += len(data)
+
+    def close(self) -> None:
+        """
+        Write IFD with raster offsets and byte counts, then header.
 
-        if _close:
+        Raises:
+            ValueError: if a block is missing.
+        """
+        if self._fileobj is None:
+            return
+        missing = self._blocks.count(None)
+        if missing:
+            raise ValueError("%d raster blocks not written" % missing)
+        offsets, bytecounts = zip(*self._blocks)
+        # IFD starts on a word boundary
+        if self._end % 2:
+            self._fileobj.seek(self._end)
+            self._fileobj.write(b"\x00")
+            self._end += 1
+        bigtiff = self.bigtiff
+        if bigtiff is None:
+            bigtiff = self._end > 0xFFFFFFFF
+        for key, values in zip(
+            [r[1:] for r in ifd._RASTERS if r[0] == self._name][0],
+            (offsets, bytecounts)
+        ):
+            self.ifd.set(
+                key, 16 if bigtiff else 4,
+                values if len(values) > 1 else values[0]
+            )
+        if self.bigtiff is None and not bigtiff:
+            # IFD is written after raster data
+            bigtiff = self._end + _layout_size([self.ifd]) - \
+                sum(bytecounts) > 0xFFFFFFFF
+        fileobj = self._fileobj
+        _write_IFD(
+            self.ifd, fileobj, self._end, self.byteorder, bigtiff=bigtiff,
+            raster=False
+        )
+        fileobj.seek(0)
+        _write_header(fileobj, self.byteorder, bigtiff, self._end)
+        if self._close:
             fileobj.close()
-            del fileobj
+        else:
+            fileobj.seek(0, 2)
+        self._fileobj = None
+
+
+def _pad(data: bytes, size: int, exif: bool = True) -> bytes:
+    """
+    Extend APP1 segment content up to `size` bytes, with zeros after EXIF
+    data or with whitespaces after XMP root element, a new line every 100
+    bytes as XMP specification suggests.
+    """
+    count = size - len(data)
+    if exif:
+        return data + bytes(count)
+    return data + ((b" " * 99 + b"\n") * (count // 100 + 1))[-count:] \
+        if count else data
 
 
 class JpegFile(list):
@@ -386,6 +1177,10 @@ class JpegFile(list):
 
     Args:
         fileobj (IO[AnyStr]): a python file object.
+        metadata_only (bool): do not read the entropy-coded scan, only record
+            its position in the file; it is streamed from there on `save`.
+            Ignored if `fileobj` is not bound to a file path.
+        tags (list): EXIF tag numbers or keys to read (see `Tyf.TiffFile`).
 
     ```python
     >>> jpg = Tyf.open("test/IMG_20150730_210115.jpg")
@@ -413,10 +1208,21 @@ class JpegFile(list):
         "Shortcut to XMP attribute."
         if not hasattr(obj, "_JpegFile__xmp_ns"):
             raise XmpDataNotFound("no XMP segment found")
-        return list.__getitem__(obj, obj.__xmp_idx)[-1]
-
-    def __init__(self, fileobj: IO[AnyStr]) -> None:
+        marker, value = list.__getitem__(obj, obj.__xmp_idx)
+        if isinstance(value, bytes):
+            value = _etree().fromstring(value)
+            list.__setitem__(obj, obj.__xmp_idx, (marker, value))
+        return value
+
+    def __init__(
+            self, fileobj: IO[AnyStr], metadata_only: bool = False,
+            tags: list = None) -> None:
         sgmt = []
+        # file path and (offset, size) of EXIF and XMP payloads found there
+        name = getattr(fileobj, "name", None)
+        self.__path = name if isinstance(name, (str, bytes)) and \
+            os.path.isfile(name) else None
+        self.__rooms = {}
 
         fileobj.seek(0)
         marker, = unpack(">H", fileobj)
@@ -428,22 +1234,33 @@ class JpegFile(list):
             # if JPEG raw data
             if marker == 0xffda:
                 fileobj.seek(-2, 1)
-                sgmt.append((0xffda, fileobj.read()[:-2]))
+                reader = source.from_fileobj(fileobj, name_only=True) \
+                    if metadata_only else None
+                if reader is None:
+                    sgmt.append((0xffda, fileobj.read()[:-2]))
+                else:
+                    # scan ends with the 2 bytes of EOI marker
+                    offset = fileobj.tell()
+                    sgmt.append((0xffda, source.Slice(
+                        reader, offset, len(reader) - offset - 2
+                    )))
                 marker = 0xffd9
             elif marker == 0xffe1:
+                room = (fileobj.tell(), count - 2)
                 data = fileobj.read(count-2)
                 if data[:6] == b"Exif\x00\x00":
                     string = StringIO(data[6:])
-                    self.ifd = TiffFile(string)
+                    self.ifd = TiffFile(string, tags=tags)
                     string.close()
+                    self.__rooms[id(self.ifd)] = room
                     sgmt.append((marker, self.ifd))
                 elif b"ns.adobe.com" in data[:30]:
                     xmp_data_idx = data.find(b"\x00")
+                    self.__rooms["xmp"] = room
                     self.__xmp_idx = len(sgmt)
                     self.__xmp_ns = data[:xmp_data_idx]
-                    sgmt.append(
-                        (marker, ET.fromstring(data[xmp_data_idx+1:]))
-                    )
+                    # raw xml is parsed on first `xmp` access
+                    sgmt.append((marker, data[xmp_data_idx+1:]))
             else:
                 sgmt.append((marker, fileobj.read(count-2)))
 
@@ -479,7 +1296,8 @@ class JpegFile(list):
         """
         return self.ifd1.get(item, default)
 
-    def set_xmp(self, tag: str, value: str, **attributes) -> ET.SubElement:
+    def set_xmp(
+            self, tag: str, value: str, **attributes) -> "ET.SubElement":
         """
         Set xmp tag value. Custom namespace can be used.
 
@@ -492,6 +1310,7 @@ class JpegFile(list):
         Returns:
             xml.etree.ElementTree.Element: tag element.
         """
+        ET = _etree()
         # create the xmp segment if no one found
         if not hasattr(self, "_JpegFile__xmp_ns"):
             self.__xmp_ns = b"http://ns.adobe.com/xap/1.0/"
@@ -516,7 +1335,7 @@ class JpegFile(list):
         parent.append(elem)
         return elem
 
-    def get_xmp(self, tag: str, ns: str = "EXIF") -> ET.Element:
+    def get_xmp(self, tag: str, ns: str = "EXIF") -> "ET.Element":
         """
         Get xmp tag value. Custom namespace can be used.
 
@@ -530,42 +1349,68 @@ class JpegFile(list):
         """
         return self.xmp.find(".//{%s}%s" % (XmpNamespace.get(ns, ns), tag))
 
-    def save(self, f: Union[str, IO[AnyStr]]) -> None:
+    def _app1(self, idx: int, value) -> bytes:
+        "Return APP1 segment `idx` content with EXIF or XMP recomputed."
+        if isinstance(value, TiffFile):
+            string = StringIO()
+            if len(value) == 2:
+                value.save(string, idx=0, ifd1=value[-1])
+            else:
+                value.save(string)
+            data = string.getvalue()
+            string.close()
+            return b"Exif\x00\x00" + (
+                data if isinstance(data, bytes) else data.encode("utf-8")
+            )
+        elif idx == getattr(self, "_JpegFile__xmp_idx", None):
+            # unparsed xmp is written back as is
+            data = value if isinstance(value, bytes) else \
+                _etree().tostring(value)
+            return self.__xmp_ns + b"\x00" + (
+                data if isinstance(data, bytes) else data.encode("utf-8")
+            )
+        return b""
+
+    def save(self, f: Union[str, IO[AnyStr]], padding: int = 0) -> None:
         """
         Save object as a JPEG file. All segmet are writed in current order,
         only `ifd0`, `ifd1` and `xmp` are recomputed.
 
         Arguments:
             f (str|IO[AnyStr]): a valid file path or a python file object
+            padding (int): bytes reserved at the end of EXIF and XMP
+                segments so later edits can be written in place (see
+                `update_in_place`)
+
+        Raises:
+            ValueError: if EXIF was read with `tags` filter.
         """
+        if getattr(getattr(self, "ifd", None), "_wanted", None) is not None:
+            raise ValueError("EXIF partially read, it cannot be saved")
+        segments = list(self)
+        for idx, (marker, value) in enumerate(segments):
+            # saving over the source file: scan has to be read before
+            if isinstance(value, source.Slice) and \
+               _same_file(f, value.reader.path):
+                segments[idx] = (marker, bytes(value))
+
         fileobj, _close = _fileobj(f, "wb")
         pack(">H", fileobj, (0xffd8,))
 
-        for marker, value in self:
+        for idx, (marker, value) in enumerate(segments):
             if marker == 0xffda:
                 pack(">H", fileobj, (marker,))
+                if isinstance(value, source.Slice):
+                    value.copy(fileobj)
+                    value.reader.close()
+                    continue
 
             elif marker == 0xffe1:
-                if isinstance(value, TiffFile):
-                    string = StringIO()
-                    if len(value) == 2:
-                        value.save(string, idx=0, ifd1=value[-1])
-                    else:
-                        value.save(string)
-                    data = string.getvalue()
-                    value = b"Exif\x00\x00" + (
-                        data if isinstance(data, bytes)
-                        else data.encode("utf-8")
-                    )
-                    string.close()
-                elif isinstance(value, ET.Element):
-                    data = ET.tostring(self.xmp)
-                    value = self.__xmp_ns + b"\x00" + (
-                        data if isinstance(data, bytes)
-                        else data.encode("utf-8")
-                    )
-                else:
-                    value = b""
+                value = self._app1(idx, value)
+                if padding and value:
+                    value = _pad(value, min(
+                        len(value) + padding, 0xffff - 2
+                    ), value[:4] == b"Exif")
                 pack(">HH", fileobj, (marker, len(value) + 2))
 
             else:
@@ -579,6 +1424,55 @@ class JpegFile(list):
             fileobj.close()
             del fileobj
 
+    def update_in_place(self) -> None:
+        """
+        Overwrite EXIF and XMP segments in source file without rewriting the
+        rest of it. Recomputed segments have to fit in the original ones,
+        remaining space is filled with zeros in EXIF segment and with
+        whitespaces in XMP one.
+
+        ```python
+        >>> jpg = Tyf.open("test/IMG_20150730_210115.jpg", metadata_only=True)
+        >>> jpg.ifd0["Copyright"] = "THOORENS Bruno"
+        >>> jpg.update_in_place()
+        ```
+
+        Raises:
+            ValueError: if a segment does not fit or was not in source file,
+                if EXIF was read with `tags` filter or if instance was not
+                opened from a file path.
+        """
+        if self.__path is None:
+            raise ValueError("in place update needs a file path")
+        patches = []
+        for idx, (marker, value) in enumerate(list.__iter__(self)):
+            if marker != 0xffe1:
+                continue
+            is_exif = isinstance(value, TiffFile)
+            if is_exif and value._wanted is not None:
+                raise ValueError("EXIF partially read, it cannot be updated")
+            if is_exif:
+                room = self.__rooms.get(id(value))
+            elif idx == getattr(self, "_JpegFile__xmp_idx", None):
+                room = self.__rooms.get("xmp")
+            else:
+                room = None
+            if room is None:
+                raise ValueError(
+                    "APP1 segment %d not found in file, use save instead" % idx
+                )
+            data = self._app1(idx, value)
+            if len(data) > room[-1]:
+                raise ValueError(
+                    "%s segment does not fit, use save instead" %
+                    ("EXIF" if is_exif else "XMP")
+                )
+            patches.append((room[0], _pad(data, room[-1], is_exif)))
+        with io.open(self.__path, "r+b") as fileobj:
+            for offset, data in patches:
+                fileobj.seek(offset)
+                fileobj.write(data)
+
     def save_thumbnail(self, f: Union[str, IO[AnyStr]]) -> None:
         """
         Save JPEG thumbnail in a separated TIFF or JPEG file, file extention
@@ -628,12 +1522,30 @@ class JpegFile(list):
             del fileobj
 
 
-def open(f: Union[str, IO[AnyStr]]) -> Union[TiffFile, JpegFile]:
+def open(
+        f: Union[str, IO[AnyStr]],
+        mmap: bool = False,
+        metadata_only: bool = False,
+        tags: list = None,
+        cache_size: int = 128,
+        index: bool = True,
+        block_cache: int = 64 << 20) -> Union[TiffFile, JpegFile]:
     """
     Return `JpegFile` or `TiffFile` instance according to argument.
 
     Args:
         f (str|IO[AnyStr]): a valid file path or a python file object.
+        mmap (bool): memory-map TIFF file (see `Tyf.TiffFile`).
+        metadata_only (bool): do not read JPEG scan data (see
+            `Tyf.JpegFile`).
+        tags (list): tag numbers or keys to read, others are skipped (see
+            `Tyf.TiffFile`).
+        cache_size (int): number of parsed TIFF IFD kept in memory (see
+            `Tyf.TiffFile`).
+        index (bool): use TIFF sidecar index file if any (see
+            `Tyf.TiffFile`).
+        block_cache (int): TIFF block cache size in bytes (see
+            `Tyf.TiffFile`).
 
     Returns:
         Tyf.JpegFile|Tyf.TiffFile: JPEG or TIFF instance.
@@ -647,9 +1559,12 @@ def open(f: Union[str, IO[AnyStr]]) -> Union[TiffFile, JpegFile]:
     fileobj.seek(0)
 
     if first == 0xffd8:
-        obj = JpegFile(fileobj)
+        obj = JpegFile(fileobj, metadata_only=metadata_only, tags=tags)
     elif first in [0x4d4d, 0x4949]:
-        obj = TiffFile(fileobj)
+        obj = TiffFile(
+            fileobj, mmap=mmap, tags=tags, cache_size=cache_size, index=index,
+            block_cache=block_cache
+        )
     else:
         obj = None
 
@@ -662,76 +1577,53 @@ def open(f: Union[str, IO[AnyStr]]) -> Union[TiffFile, JpegFile]:
         return obj
 
 
-# if PIL exists do some overridings
-try:
-    from PIL import Image as _Image
-except ImportError:
-    pass
-else:
+class _PillowFinder(object):
+    """
+    Meta path finder applying `Tyf.pillow` overridings once `PIL.Image` is
+    imported, so `import Tyf` does not import Pillow itself. Overridings
+    wait for the end of the outermost Pillow module being imported: Pillow
+    modules importing `PIL.Image` may not be fully initialized before.
+    """
 
-    def _getmeta(im):
-        for _, data in im.applist:
-            if data[:6] == b'Exif\x00\x00':
-                fileobj = io.BytesIO(data[6:])
-                setattr(im, "ifd", TiffFile(fileobj))
-                fileobj.close()
-            elif data[:29] == b'http://ns.adobe.com/xap/1.0/\x00':
-                setattr(im, "xmp", ET.fromstring(data[29:]))
-
-    def _getexif(im):
-        if not hasattr(im, "ifd"):
-            try:
-                data = im.info["exif"]
-            except KeyError:
-                return None
-            # b'Exif\x00\x00' -> 6 bytes
-            fileobj = io.BytesIO(data[6:])
-            setattr(im, "ifd", TiffFile(fileobj))
-            fileobj.close()
-            del fileobj
-        return im.ifd
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith("PIL.") or self not in sys.meta_path:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is not None and hasattr(spec.loader, "exec_module"):
+            exec_module = spec.loader.exec_module
+
+            def exec_and_override(module):
+                exec_module(module)
+                if self in sys.meta_path and "PIL.Image" in sys.modules \
+                   and not _pillow_importing(fullname):
+                    sys.meta_path.remove(self)
+                    importlib.import_module("Tyf.pillow")
+
+            spec.loader.exec_module = exec_and_override
+        return spec
+
+
+def _pillow_importing(but: str = None) -> bool:
+    "Return `True` if a Pillow module other than `but` is being imported."
+    return any(
+        getattr(getattr(module, "__spec__", None), "_initializing", False)
+        for name, module in list(sys.modules.items())
+        if name.startswith("PIL.") and name != but
+    )
 
-    class Image(_Image.Image):
-        """
-        Pillow Image class override.
-        """
 
-        # keep a reference of original PIL Image object
-        _image_ = _Image.Image
-
-        @staticmethod
-        def open(*args, **kwargs):
-            img = _Image.open(*args, **kwargs)
-            img._getmeta()
-            return img
-
-        def save(self, fp, format=None, **params):
-            if (
-                isinstance(fp, str) and
-                os.path.splitext(fp)[-1].lower() in [".jpg", ".jpeg"]
-                or
-                isinstance(format, str) and
-                format.lower() == "jpeg"
-            ) and not params.pop("strip_exif", False):
-                self._getexif()
-                stringio = StringIO()
-                self.ifd.save(stringio, idx=0, ifd1=self.ifd[1])
-                data = stringio.getvalue()
-                params["exif"] = b'Exif\x00\x00' + (
-                    data if isinstance(data, bytes) else
-                    data.encode("utf-8")
-                )
-                stringio.close()
-                del stringio, data
-            if hasattr(self, "xmp"):
-                params["xmp"] = b'http://ns.adobe.com/xap/1.0/\x00' + \
-                    ET.tostring(self.xmp)
-            return Image._image_.save(self, fp, format, **params)
-
-    #: Pillow override
-    _Image.Image = Image
-
-    from PIL import JpegImagePlugin
-    JpegImagePlugin._getexif = _getexif
-    JpegImagePlugin.JpegImageFile._getmeta = _getmeta
-    del _getexif, _getmeta
+def __getattr__(name):
+    # Pillow Image override is reachable as `Tyf.Image`
+    if name == "Image":
+        try:
+            return importlib.import_module("Tyf.pillow").Image
+        except ImportError:
+            pass
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+# if PIL exists do some overridings
+if "PIL.Image" in sys.modules and not _pillow_importing():
+    importlib.import_module("Tyf.pillow")
+else:
+    sys.meta_path.insert(0, _PillowFinder())
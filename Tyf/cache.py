@@ -0,0 +1,113 @@
+# -*- encoding:utf-8 -*-
+"""
+`Tyf.cache` module defines the bounded caches used to keep parsed IFD and
+raster blocks in memory.
+"""
+
+import threading
+import collections
+
+
+class LRU(object):
+    """
+    Least recently used mapping bounded by a budget. Each item costs
+    `sizeof(value)` (1 by default) and least recently used items are evicted
+    once the total cost exceeds `budget`. `evict` callback is called with
+    evicted key and value; if it returns `True`, item is kept out of budget
+    (pinned) and not evicted again until `unpin` is called.
+
+    Args:
+        budget (int): maximum total cost of cached items.
+        sizeof (callable): item cost.
+        evict (callable): eviction callback.
+
+    ```python
+    >>> from Tyf import cache
+    >>> lru = cache.LRU(2)
+    >>> lru[0], lru[1], lru[2] = "a", "b", "c"
+    >>> 0 in lru, lru.get(2), lru.evictions
+    (False, 'c', 1)
+    ```
+    """
+
+    def __init__(self, budget, sizeof=None, evict=None):
+        self.budget = budget
+        self.sizeof = sizeof or (lambda value: 1)
+        self.evict = evict
+        self.cost = 0
+        self.hits = self.misses = self.evictions = 0
+        self._items = collections.OrderedDict()
+        self._pinned = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._items) + len(self._pinned)
+
+    def __contains__(self, key):
+        return key in self._items or key in self._pinned
+
+    def __repr__(self):
+        return "<LRU %d/%d hits=%d misses=%d evictions=%d>" % (
+            self.cost, self.budget, self.hits, self.misses, self.evictions
+        )
+
+    def get(self, key, default=None):
+        "Return cached value and mark it as most recently used."
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            elif key in self._pinned:
+                self.hits += 1
+                return self._pinned[key]
+            self.misses += 1
+            return default
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self.pop(key)
+            cost = self.sizeof(value)
+            self._items[key] = (value, cost)
+            self.cost += cost
+            while self.cost > self.budget and len(self._items) > 1:
+                old_key, (old_value, old_cost) = \
+                    self._items.popitem(last=False)
+                self.cost -= old_cost
+                if self.evict is not None and self.evict(old_key, old_value):
+                    self._pinned[old_key] = old_value
+                else:
+                    self.evictions += 1
+
+    def pop(self, key, default=None):
+        "Remove key from cache and return its value."
+        with self._lock:
+            if key in self._items:
+                value, cost = self._items.pop(key)
+                self.cost -= cost
+                return value
+            return self._pinned.pop(key, default)
+
+    def unpin(self, key):
+        "Put pinned item back in budget as the most recently used one."
+        with self._lock:
+            if key in self._pinned:
+                self[key] = self._pinned[key]
+
+    def values(self):
+        "Return a list of all cached values."
+        with self._lock:
+            return [v for v, c in self._items.values()] + \
+                list(self._pinned.values())
+
+    def items(self):
+        "Return a list of all cached `(key, value)` pairs."
+        with self._lock:
+            return [(k, v) for k, (v, c) in self._items.items()] + \
+                list(self._pinned.items())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._pinned.clear()
+            self.cost = 0
@@ -0,0 +1,421 @@
+# -*- encoding:utf-8 -*-
+"""
+`Tyf.compression` module defines raster block codecs keyed by `Compression`
+tag value and `Predictor` filters. Deflate uses `zlib`, LZW and PackBits are
+pure python and predictors run on `numpy` arrays if it is installed.
+
+```python
+>>> from Tyf import compression
+>>> data = compression.encode(b"tyf" * 1000, 5)  # LZW
+>>> len(data), compression.decode(data, 5) == b"tyf" * 1000
+(152, True)
+```
+"""
+
+import sys
+import re
+import zlib
+import array
+import operator
+import itertools
+import collections
+
+#: `numpy` module, imported on first predictor use, `False` if missing
+numpy = None
+
+_BIG_ENDIAN = sys.byteorder == "big"
+#: array type codes of 1, 2, 4 and 8-byte unsigned integers
+_TYPECODES = dict(
+    (array.array(code).itemsize, code) for code in "LQIHB"
+)
+#: `(decode, encode)` functions by `Compression` tag value
+CODECS = {}
+#: blocks submitted to a worker pool at once, per worker
+INFLIGHT = 4
+
+
+def register(compression, decode, encode):
+    """
+    Register block codec of a `Compression` tag value.
+
+    Args:
+        compression (int): `Compression` tag value.
+        decode (callable): function returning raw bytes of encoded block.
+        encode (callable): function returning encoded bytes of raw block.
+    """
+    CODECS[compression] = (decode, encode)
+
+
+def _codec(compression):
+    try:
+        return CODECS[compression]
+    except KeyError:
+        raise ValueError("compression %s not supported" % compression)
+
+
+def decode(
+        data, compression=1, predictor=1, width=0, samples=1, bits=8,
+        byteorder="<"):
+    """
+    Return raw data of an encoded raster block.
+
+    Args:
+        data (bytes): encoded block.
+        compression (int): `Compression` tag value.
+        predictor (int): `Predictor` tag value.
+        width (int): block width in pixel, needed by predictors.
+        samples (int): samples per pixel in block.
+        bits (int): bits per sample.
+        byteorder (string): `">"` if big-endian used else `"<"`.
+
+    Returns:
+        bytes: raw block data.
+
+    Raises:
+        ValueError: if compression or predictor is not supported.
+    """
+    data = _codec(compression)[0](data)
+    if predictor != 1:
+        data = _predictor(
+            data, predictor, width, samples, bits, byteorder, False
+        )
+    return data
+
+
+def encode(
+        data, compression=1, predictor=1, width=0, samples=1, bits=8,
+        byteorder="<"):
+    """
+    Return encoded data of a raw raster block (see `Tyf.compression.decode`
+    for arguments).
+
+    Returns:
+        bytes: encoded block data.
+    """
+    if predictor != 1:
+        data = _predictor(
+            data, predictor, width, samples, bits, byteorder, True
+        )
+    return _codec(compression)[1](data)
+
+
+def recode(data, decoding, encoding):
+    """
+    Return block encoded with `encoding` arguments once decoded with
+    `decoding` ones (see `Tyf.compression.decode`).
+    """
+    return encode(decode(data, **decoding), **encoding)
+
+
+def imap(function, items, workers=None):
+    """
+    Yield `function(item)` for all items in order. If `workers` is given,
+    items are processed by a pool of threads or processes while at most
+    `INFLIGHT` items per worker are pending, so memory stays bounded
+    whatever the item count. `zlib` releases the GIL so threads are enough
+    for Deflate, pure python LZW and PackBits scale with processes only.
+
+    ```python
+    >>> import functools
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> blocks = [compression.encode(b"tyf" * 1000, 5)] * 64
+    >>> with ProcessPoolExecutor(4) as pool:
+    ...     data = list(compression.imap(
+    ...         functools.partial(compression.decode, compression=5),
+    ...         blocks, pool
+    ...     ))
+    ```
+
+    Args:
+        function (callable): function to apply, picklable if processes are
+            used.
+        items (iterable): function arguments, consumed as results are
+            yielded.
+        workers (int or concurrent.futures.Executor): thread count or pool
+            to use, items are processed in calling thread if `None`.
+
+    Yields:
+        function results.
+    """
+    if not workers:
+        for item in items:
+            yield function(item)
+        return
+    # imported here so `import Tyf` does not load it
+    import concurrent.futures
+    pool = workers if isinstance(workers, concurrent.futures.Executor) else \
+        concurrent.futures.ThreadPoolExecutor(workers)
+    processes = isinstance(pool, concurrent.futures.ProcessPoolExecutor)
+    size = INFLIGHT * (getattr(pool, "_max_workers", None) or 1)
+    pending = collections.deque()
+    try:
+        for item in items:
+            # memory views can not be sent to other processes
+            if processes and isinstance(item, memoryview):
+                item = item.tobytes()
+            pending.append(pool.submit(function, item))
+            if len(pending) >= size:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not workers:
+            pool.shutdown()
+
+
+def _predictor(data, predictor, width, samples, bits, byteorder, forward):
+    size = bits // 8
+    if predictor not in (2, 3) or bits % 8 or size not in (1, 2, 4, 8) or \
+       width <= 0:
+        raise ValueError("predictor %s not supported" % predictor)
+    row = width * samples * size
+    # incomplete last row is left as is
+    stop = len(data) - len(data) % row
+    if predictor == 2:
+        result = _horizontal(
+            data[:stop], width * samples, samples, size, byteorder, forward
+        )
+    else:
+        result = _floating(
+            data[:stop], width * samples, samples, size, byteorder, forward
+        )
+    return result + bytes(data[stop:])
+
+
+def _numpy():
+    "Import `numpy` on first need, predictors run faster with it."
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy
+
+
+def _difference(values):
+    # horizontal differencing of one sample channel
+    return itertools.chain(values[:1], map(operator.sub, values[1:], values))
+
+
+def _horizontal(data, count, samples, size, byteorder, forward):
+    # predictor 2 : differencing of integer samples, `count` samples a row
+    if _numpy():
+        dtype = numpy.dtype("u%d" % size)
+        values = numpy.frombuffer(
+            data, dtype.newbyteorder(byteorder)
+        ).astype(dtype).reshape(-1, count // samples, samples)
+        if forward:
+            result = values.copy()
+            result[:, 1:] -= values[:, :-1]
+        else:
+            result = numpy.cumsum(values, axis=1, dtype=dtype)
+        return result.astype(dtype.newbyteorder(byteorder)).tobytes()
+    values = array.array(_TYPECODES[size], data)
+    swap = (byteorder == ">") != _BIG_ENDIAN
+    if swap:
+        values.byteswap()
+    function = _difference if forward else itertools.accumulate
+    rows = range(0, len(values), count)
+    if size == 8:
+        # 64-bit sums may overflow array items, mask them instead
+        mask = (1 << 64) - 1
+        for start in rows:
+            for k in range(samples):
+                values[start + k:start + count:samples] = array.array(
+                    "Q", map(
+                        mask.__and__,
+                        function(values[start + k:start + count:samples])
+                    )
+                )
+        if swap:
+            values.byteswap()
+        return values.tobytes()
+    # sums and differences of smaller samples fit signed 64-bit items whose
+    # low order bytes are the result modulo sample size
+    result = bytearray(len(data))
+    step = samples * size
+    for k in range(samples):
+        sums = array.array("q", itertools.chain.from_iterable(
+            function(values[start + k:start + count:samples])
+            for start in rows
+        )).tobytes()
+        for j in range(size):
+            byte = j if byteorder == "<" else size - 1 - j
+            result[k * size + j::step] = \
+                sums[7 - byte if _BIG_ENDIAN else byte::8]
+    return bytes(result)
+
+
+def _floating(data, count, samples, size, byteorder, forward):
+    # predictor 3 : bytes of floating point values of a row are gathered by
+    # significance, most significant first, and differenced as bytes
+    row = count * size
+    order = range(size) if byteorder == ">" else range(size - 1, -1, -1)
+    if not forward:
+        data = _horizontal(data, row, samples, 1, byteorder, False)
+    if _numpy():
+        if forward:
+            result = numpy.frombuffer(data, "u1").reshape(-1, count, size)
+            result = result[:, :, list(order)].transpose(0, 2, 1).tobytes()
+            return _horizontal(result, row, samples, 1, byteorder, True)
+        result = numpy.empty((len(data) // row, count, size), "u1")
+        result[:, :, list(order)] = numpy.frombuffer(data, "u1") \
+            .reshape(-1, size, count).transpose(0, 2, 1)
+        return result.tobytes()
+    result = bytearray(len(data))
+    for start in range(0, len(data), row):
+        for plane, byte in enumerate(order):
+            plane = start + plane * count
+            if forward:
+                result[plane:plane + count] = \
+                    data[start + byte:start + row:size]
+            else:
+                result[start + byte:start + row:size] = \
+                    data[plane:plane + count]
+    if forward:
+        return _horizontal(result, row, samples, 1, byteorder, True)
+    return bytes(result)
+
+
+def _unpack_bits(data):
+    # PackBits : header n in [0, 127] copies n + 1 bytes, n in [-127, -1]
+    # repeats next byte 1 - n times and -128 is a no-op
+    result = bytearray()
+    i, size = 0, len(data)
+    while i < size:
+        n = data[i]
+        if n < 128:
+            result += data[i + 1:i + n + 2]
+            i += n + 2
+        elif n > 128:
+            result += bytes((data[i + 1], )) * (257 - n)
+            i += 2
+        else:
+            i += 1
+    return bytes(result)
+
+
+def _pack_bits(data):
+    data = bytes(data)
+    result = bytearray()
+    position = 0
+    # runs of three identical bytes or more are repeated, others are copied
+    for match in itertools.chain(_RUNS.finditer(data), [None]):
+        start, stop = match.span() if match else (len(data), len(data))
+        for i in range(position, start, 128):
+            chunk = data[i:min(i + 128, start)]
+            result.append(len(chunk) - 1)
+            result += chunk
+        for i in range(start, stop, 128):
+            count = min(128, stop - i)
+            result.append(257 - count if count > 1 else 0)
+            result.append(data[start])
+        position = stop
+    return bytes(result)
+
+
+def _lzw_decode(data):
+    # codes are read most significant bit first, 9 to 12 bits wide, 256 is
+    # the clear code and 257 ends data. Width grows one code early.
+    size = len(data)
+    # big-endian 32-bit words, padded so a code always spans two words
+    words = array.array(_TYPECODES[4], bytes(data) + bytes(8 - size % 4))
+    if not _BIG_ENDIAN:
+        words.byteswap()
+    words = words.tolist()
+    table = list(_LZW_TABLE)
+    append = table.append
+    result = bytearray()
+    position, end = 0, size * 8
+    width, mask, count = 9, 511, 258
+    previous = None
+    while position + width <= end:
+        index = position >> 5
+        code = (
+            (words[index] << 32 | words[index + 1]) >>
+            (64 - width - (position & 31))
+        ) & mask
+        position += width
+        if code < 256 or 257 < code < count:
+            entry = table[code]
+            if previous is not None:
+                append(previous + entry[:1])
+                count += 1
+        elif code == count and previous is not None:
+            entry = previous + previous[:1]
+            append(entry)
+            count += 1
+        elif code == 256:
+            del table[258:]
+            width, mask, count = 9, 511, 258
+            previous = None
+            continue
+        elif code == 257:
+            break
+        else:
+            raise ValueError("invalid LZW code %d" % code)
+        result += entry
+        previous = entry
+        if count == mask and width < 12:
+            width += 1
+            mask = (1 << width) - 1
+    return bytes(result)
+
+
+def _lzw_encode(data):
+    # dictionary maps (prefix code << 8 | next byte) to code
+    table = {}
+    result = bytearray()
+    accumulator, count = 256, 9
+    width, free = 9, 258
+    prefix = None
+    for byte in data:
+        if prefix is None:
+            prefix = byte
+            continue
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        accumulator = accumulator << width | prefix
+        count += width
+        table[key] = free
+        free += 1
+        prefix = byte
+        if free >= 4094:
+            # table full : emit clear code and restart
+            accumulator = accumulator << width | 256
+            count += width
+            table.clear()
+            width, free = 9, 258
+        elif free > (1 << width) - 1:
+            width += 1
+        if count >= 32:
+            count -= 32
+            result += (accumulator >> count).to_bytes(4, "big")
+            accumulator &= (1 << count) - 1
+    if prefix is not None:
+        accumulator = accumulator << width | prefix
+        count += width
+        free += 1
+        if free > (1 << width) - 1 and width < 12:
+            width += 1
+    accumulator = accumulator << width | 257
+    count += width
+    padding = -count % 8
+    result += (accumulator << padding).to_bytes((count + padding) // 8, "big")
+    return bytes(result)
+
+
+_RUNS = re.compile(rb"(.)\1{2,}", re.S)
+_LZW_TABLE = [bytes((i, )) for i in range(256)] + [b"", b""]
+
+register(1, bytes, bytes)
+register(5, _lzw_decode, _lzw_encode)
+register(8, zlib.decompress, zlib.compress)
+register(32946, zlib.decompress, zlib.compress)
+register(32773, _unpack_bits, _pack_bits)
@@ -64,6 +64,9 @@ def _11(value):
 #: see Tyf.decoders._11
 _12 = _11
 
+#: see Tyf.decoders._1
+_16 = _17 = _18 = _1
+
 
 # PrivateTiffTag
 
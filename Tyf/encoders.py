@@ -12,6 +12,8 @@ _m_u_byte = 0
 _M_u_byte = 2**16
 _m_u_long = 0
 _M_u_long = 2**32
+_m_u_long8 = 0
+_M_u_long8 = 2**64
 
 _m_s_short = -_M_u_short / 2
 _M_s_short = _M_u_short / 2 - 1
@@ -19,6 +21,8 @@ _m_s_byte = -_M_u_byte / 2
 _M_s_byte = _M_u_byte / 2 - 1
 _m_s_long = -_M_u_long / 2
 _M_s_long = _M_u_long / 2 - 1
+_m_s_long8 = -_M_u_long8 // 2
+_M_s_long8 = _M_u_long8 // 2
 
 _m_float = -1.17549e38
 _M_float = 3.40282e38
@@ -161,6 +165,24 @@ def _12(value):
         return (in_range(value, _m_double, _M_double, cast=float), )
 
 
+def _16(value):
+    if isinstance(value, tuple):
+        return tuple(in_range(v, _m_u_long8, _M_u_long8) for v in value)
+    else:
+        return (in_range(value, _m_u_long8, _M_u_long8), )
+
+
+def _17(value):
+    if isinstance(value, tuple):
+        return tuple(in_range(v, _m_s_long8, _M_s_long8) for v in value)
+    else:
+        return (in_range(value, _m_s_long8, _M_s_long8), )
+
+
+#: see Tyf.encoders._16
+_18 = _16
+
+
 # PrivateTiffTag:
 
 def XPTitle(value):
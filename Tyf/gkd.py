@@ -1,6 +1,6 @@
 # -*- encoding: utf-8 -*-
 
-from Tyf import values, __geotiff__
+from Tyf import _values, __geotiff__
 
 
 _TAGS = {
@@ -75,7 +75,7 @@ class GkdTag:
     strict = True
     info = property(
         lambda cls: getattr(
-            values, _2KEY.get(cls.tag, cls.key), {}
+            _values(), _2KEY.get(cls.tag, cls.key), {}
         ).get(cls._decode(), None),
         None, None, ""
     )
@@ -87,7 +87,7 @@ class GkdTag:
         value = default if value is None else value
 
         self.tag = tag
-        restricted = getattr(values, self.key, {})
+        restricted = getattr(_values(), self.key, {})
 
         if restricted:
             reverse = dict((v, k) for k, v in restricted.items())
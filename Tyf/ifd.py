@@ -1,16 +1,15 @@
 # -*- encoding:utf-8 -*-
 
 import io
+import copy
+import mmap
 import struct
+import functools
 import collections
 
 from Tyf import TYPES, reduce
-from Tyf import tags, encoders, decoders, values
-
-try:
-    from urllib.request import urlopen
-except ImportError:
-    from urllib import urlopen
+from Tyf import tags, encoders, decoders, _values
+from Tyf import compression as _compression
 
 
 #: Mapping of named tuple to be used with geotiff `ModelPixelScaleTag`,
@@ -36,6 +35,65 @@ GeoKeyModel = {
 }
 
 
+#: compiled `struct.Struct` cache for fixed formats such as IFD entry header
+_struct = functools.lru_cache(maxsize=None)(struct.Struct)
+
+
+@functools.lru_cache(maxsize=1024)
+def _value_struct(byteorder, typ, count):
+    """
+    Return compiled `struct.Struct` packing `count` values of tag type `typ`.
+    Counted format (ie `"<50000L"`) is used instead of repeated characters so
+    format size and compilation do not grow with value count.
+    """
+    fmt = TYPES[typ][0]
+    return struct.Struct("%s%d%s" % (byteorder, count * len(fmt), fmt[0]))
+
+
+#: maximum gap in bytes between two out-of-entry values read at once
+_READ_GAP = 4096
+#: maximum size in bytes of a merged raster read
+_READ_CHUNK = 64 << 20
+
+
+def _coalesce(ranges, gap=0, limit=None):
+    """
+    Merge `(offset, size, item)` ranges sorted by offset when they are less
+    than `gap` bytes apart and merged size does not exceed `limit`. Yield
+    `(start, stop, [(offset, size, item)...])` so each merged range can be
+    read once and sliced.
+    """
+    start = stop = None
+    members = []
+    for offset, size, item in ranges:
+        if start is not None and (offset > stop + gap or (
+            limit is not None and offset + size - start > limit
+        )):
+            yield start, stop, members
+            start, members = None, []
+        if start is None:
+            start, stop = offset, offset + size
+        stop = max(stop, offset + size)
+        members.append((offset, size, item))
+    if start is not None:
+        yield start, stop, members
+
+
+#: entry count, entry and offset formats of TIFF and BigTIFF (`True`) IFD
+_LAYOUTS = {
+    False: ("H", "HHL4s", "L"),
+    True: ("Q", "HHQ8s", "Q"),
+}
+
+
+def _ifd_size(nb_entry, bigtiff=False):
+    "Return IFD size in bytes: entry count, entries and next IFD offset."
+    nb_fmt, entry_fmt, offset_fmt = _LAYOUTS[bigtiff]
+    return _struct("=" + nb_fmt).size + \
+        nb_entry * _struct("=" + entry_fmt).size + \
+        _struct("=" + offset_fmt).size
+
+
 def Transform(obj, x=0., y=0., z=0.):
     """
     Transformation between raster and model space using a model transformation
@@ -72,11 +130,33 @@ def Transform(obj, x=0., y=0., z=0.):
     )
 
 
+#: Immutable tag definition shared by all `Tyf.ifd.Tag` of a same tag
+#: number: registry entry plus key specific encoder and decoder if any.
+TagDefinition = collections.namedtuple(
+    "TagDefinition", "tag, key, types, default, comment, encoder, decoder"
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _definition(tag_or_key):
+    "Return the `TagDefinition` flyweight of a tag number or key."
+    tag, (key, types, default, comment) = tags.get(tag_or_key)
+    return TagDefinition(
+        tag, key, types, default, comment,
+        getattr(encoders, key, None), getattr(decoders, key, None)
+    )
+
+
 class Tag(object):
     """
     Encode and decode on the fly the `_v` attribute (see `Tyf.encoders` and
     `Tyf.decoders` modules).
 
+    Values stored out of IFD entries are fetched from file only on first
+    access and decoded value is kept until a new one is set. Tag number,
+    key, comment and codecs are read from a `TagDefinition` shared by all
+    instances of a same tag.
+
     ```python
     >>> tag = ifd.Tag("GPSLongitude")
     >>> tag.value = 5.62347
@@ -86,16 +166,46 @@ class Tag(object):
     5.62347
     ```
     """
+    __slots__ = (
+        "_def", "type", "_raw", "_ref", "_value", "_is_offset", "_dirty"
+    )
+
+    tag = property(lambda cls: cls._def.tag, None, None, "")
+    key = property(lambda cls: cls._def.key, None, None, "")
+    comment = property(lambda cls: cls._def.comment, None, None, "")
+    _types = property(lambda cls: cls._def.types, None, None, "")
+    _decode = property(
+        lambda cls:
+            cls._def.decoder or getattr(decoders, "_%s" % cls.type),
+        None,
+        None,
+        ""
+    )
+    _encode = property(
+        lambda cls:
+            cls._def.encoder or getattr(encoders, "_%s" % cls.type),
+        None,
+        None,
+        ""
+    )
     value = property(
         lambda cls: cls._getvalue(),
         lambda cls, v: cls._setvalue(v),
         None,
         ""
     )
+    #: Raw value as unpacked from IFD.
+    _v = property(
+        lambda cls: cls._getraw(),
+        lambda cls, v: cls._setraw(v),
+        None,
+        ""
+    )
     count = property(
         lambda cls:
+            cls._ref[-1] if hasattr(cls, "_ref") else
             len(getattr(cls, "_v", (None, ))) //
-            (2 if getattr(cls, "type", None) in [5, 10] else 1),
+            len(TYPES.get(getattr(cls, "type", None), "?")[0]),
         None,
         None,
         ""
@@ -108,38 +218,42 @@ class Tag(object):
     #: 'Flash fired, compulsory flash mode, return light detected'
     #: ```
     info = property(
-        lambda cls: getattr(values, cls.key, {}).get(cls.value, None),
+        lambda cls: getattr(_values(), cls.key, {}).get(cls.value, None),
         None,
         None,
         ""
     )
 
+    def _getraw(self):
+        if hasattr(self, "_raw"):
+            return self._raw
+        # fetch value from source if not done yet
+        if not hasattr(self, "_ref"):
+            raise AttributeError("'Tag' object has no attribute '_v'")
+        source, byteorder, offset, count = self._ref
+        fmt = _value_struct(byteorder, self.type, count)
+        self._unpack(source.read(offset, fmt.size), 0, fmt)
+        return self._raw
+
+    def _setraw(self, value):
+        self._dirty = True
+        self._raw = value
+        # pending reference and decoded value are outdated
+        for name in ("_ref", "_value"):
+            if hasattr(self, name):
+                delattr(self, name)
+
     def _getvalue(self):
-        if not hasattr(self, "_decode"):
-            setattr(
-                self, "_decode", getattr(
-                    decoders, self.key, getattr(
-                        decoders, "_%s" % self.type
-                    )
-                )
-            )
+        if hasattr(self, "_value"):
+            return self._value
         if hasattr(self, "_v"):
-            return self._decode(self._v)
+            self._value = self._decode(self._v)
+            return self._value
         return None
 
     def _setvalue(self, value):
-        if not hasattr(self, "_encode"):
-            setattr(
-                self, "_encode", getattr(
-                    encoders, self.key, getattr(
-                        encoders, "_%s" % self.type
-                    )
-                )
-            )
         self._v = self._encode(value)
-        self._is_offset = self.count * struct.calcsize(
-            "=" + TYPES[self.type][0]
-        ) > 4
+        self._is_offset = self.calcsize() > 4
 
     def __init__(self, tag_or_key, value=None):
         """
@@ -148,9 +262,9 @@ class Tag(object):
             value (any): value of the tag. If `None` is given, it is set to
                 default value if anyone is defined.
         """
-        self.tag, (self.key, self._types, default, self.comment) = \
-            tags.get(tag_or_key)
-        self.type = self._types[-1]
+        self._def = _definition(tag_or_key)
+        self.type = self._def.types[-1]
+        default = self._def.default
         if value or default:
             self.value = value or default
 
@@ -173,54 +287,90 @@ class Tag(object):
         Returns:
             `Tyf.ifd.Tag`: tag instance.
         """
-        # read tag, type and count
-        fmt = byteorder + "HHL"
-        tag, typ, cnt = struct.unpack(
-            fmt, fileobj.read(struct.calcsize(fmt))
-        )
-        cls = Tag(tag)
-        cls.type = typ
-        # extract value_or_offset
-        value_or_offset = fileobj.read(struct.calcsize("=L"))
-        if not isinstance(value_or_offset, bytes):
-            value_or_offset = value_or_offset.encode("utf-8")
-        # prepare structure value
-        _typ = TYPES[typ][0]
-        fmt = byteorder + ("%ds" % cnt if _typ == "s" else cnt * _typ)
-        type_size = struct.calcsize("=" + _typ)
-        data_size = cnt * type_size
-        if data_size > 4:
-            cls._is_offset = True
+        # read tag, type, count and value_or_offset
+        fmt = _struct(byteorder + "HHL4s")
+        entry = fileobj.read(fmt.size)
+        if not isinstance(entry, bytes):
+            entry = entry.encode("utf-8")
+        entry = fmt.unpack(entry)
+        cls, offset = Tag.from_entry(*entry, byteorder=byteorder)
+        if offset is not None:
+            fmt = _value_struct(byteorder, cls.type, entry[2])
             # keep the end of tag definition position
             bckp = fileobj.tell()
-            offset, = struct.unpack(byteorder+"L", value_or_offset)
             fileobj.seek(offset)
-            value = struct.unpack(fmt, fileobj.read(struct.calcsize(fmt)))
+            cls._unpack(fileobj.read(fmt.size), 0, fmt)
             # go back to end of tag definition position
             fileobj.seek(bckp)
+        if cls.tag is False:
+            print(f"unknown tag {entry[0]} type {cls._types}: {cls} ignored")
+        return cls
+
+    @staticmethod
+    def from_entry(
+            tag, typ, cnt, value_or_offset, byteorder="<", source=None):
+        """
+        Create an IFD tag from an unpacked IFD entry. If the value does not
+        fit in the entry, it is fetched from `source` on first access.
+        Without source, it has to be unpacked from data found at returned
+        offset using `Tyf.ifd.Tag._unpack`.
+
+        Args:
+            tag (int): tag number.
+            typ (int): tag type.
+            cnt (int): value count.
+            value_or_offset (bytes): the 4 last bytes of IFD entry (8 for
+                BigTIFF).
+            byteorder (string): `">"` if big-endian used else `"<"`.
+            source (Tyf.source.File|Tyf.source.Buffer): random access reader
+                to fetch value from.
+
+        Returns:
+            tuple: tag instance and value offset (`None` if value read from
+                entry).
+        """
+        # no default value to encode: it is replaced by the one read
+        cls = Tag.__new__(Tag)
+        cls._def = _definition(tag)
+        cls.type = typ
+        # prepare structure value
+        fmt = _value_struct(byteorder, typ, cnt)
+        if fmt.size > len(value_or_offset):
+            cls._is_offset = True
+            offset, = _struct(
+                byteorder + ("Q" if len(value_or_offset) == 8 else "L")
+            ).unpack(value_or_offset)
+            if source is not None:
+                cls._ref = (source, byteorder, offset, cnt)
         else:
             cls._is_offset = False
-            value = struct.unpack(fmt, value_or_offset[:data_size])
+            cls._unpack(value_or_offset, 0, fmt)
+            offset = None
+        return cls, offset
+
+    def _unpack(self, data, offset, fmt):
+        "Unpack tag value from data at given offset."
+        value = fmt.unpack_from(data, offset)
         # store raw value
-        if typ in [2, 7]:
+        if self.type in [2, 7]:
             # python 3.x
             if len(value) == 1:
                 value = value[0]
             # python 2.x
             else:
                 value = b"".join(value)
-        cls._v = value
-        if cls.tag is False:
-            print(f"unknown tag {tag} type {cls._types}: {cls} ignored")
-        return cls
+        # value read from file is not an edition
+        self._raw = value
+        if hasattr(self, "_ref"):
+            del self._ref
 
     def calcsize(self):
         """
         Return tag value size in `bytes` when packed.
         """
-        return struct.calcsize("=" + TYPES[self.type][0] * self.count)
+        return _value_struct("=", self.type, self.count).size
 
-    def pack(self, byteorder):
+    def pack(self, byteorder, bigtiff=False):
         """
         Return a tuple containing packed IFD base entry [tag, type, count],
         packed value and the info if value have to be written in IFD entry or
@@ -240,68 +390,314 @@ class Tag(object):
 
         Args:
             byteorder (string): `">"` if big-endian used else `"<"`.
+            bigtiff (bool): pack a BigTIFF entry (64-bit count and 8 bytes
+                value field).
 
         Returns:
             tuple: packed ifd entry, packed value, is offset boolean
         """
         tag, typ, cnt = self.tag, self.type, self.count
-        info = struct.pack(byteorder + "HHL", tag, typ, cnt)
-        typ_ = TYPES[typ][0]
-        fmt = \
-            byteorder + ("%ds" % cnt if typ_ == "s" else cnt * typ_)
+        nb_fmt, entry_fmt, offset_fmt = _LAYOUTS[bigtiff]
+        info = _struct(byteorder + "HH" + offset_fmt).pack(tag, typ, cnt)
+        fmt = _value_struct(byteorder, typ, cnt)
         packed = \
-            struct.pack(fmt, self._v) if typ_ == "s" else \
-            struct.pack(fmt, *self._v)
-        value_is_offset = getattr(self, "_is_offset", False)
+            fmt.pack(self._v) if TYPES[typ][0] == "s" else \
+            fmt.pack(*self._v)
+        field = _struct("=" + offset_fmt).size
+        value_is_offset = fmt.size > field
         return (
             info,
-            packed if value_is_offset else packed.ljust(4, b"\x00"),
+            packed if value_is_offset else packed.ljust(field, b"\x00"),
             value_is_offset
         )
 
 
+#: raster attribute name with the offset and byte count tags defining it
+_RASTERS = (
+    ("stripes", "StripOffsets", "StripByteCounts"),
+    ("free", "FreeOffsets", "FreeByteCounts"),
+    ("tiles", "TileOffsets", "TileByteCounts"),
+)
+
+
+def _raster_blocks(obj):
+    """
+    Return raster attribute name and `(offset, bytecount)` pairs of IFD
+    blocks as found in tags, `(None, ())` if IFD has no raster.
+    """
+    for name, offsets, bytecounts in _RASTERS:
+        if offsets in obj:
+            offsets, bytecounts = obj[offsets], obj[bytecounts]
+            if not isinstance(offsets, tuple):
+                offsets, bytecounts = (offsets, ), (bytecounts, )
+            return name, tuple(zip(offsets, bytecounts))
+    return None, ()
+
+
+def _read_blocks(source, blocks, contiguous=False):
+    """
+    Return data of `(offset, bytecount)` blocks as a tuple. Neighbouring
+    blocks are read at once, up to `_READ_CHUNK` bytes, and the merged data
+    is sliced through `memoryview` without copy. If `contiguous` is `True`,
+    blocks are read in a single `bytearray` following block order and the
+    tuple of its slices is returned with it.
+    """
+    if contiguous:
+        raster = bytearray(sum(bytecount for offset, bytecount in blocks))
+        view = memoryview(raster)
+        # runs of blocks following each other in file are read at once
+        runs = []
+        for offset, bytecount in blocks:
+            if runs and runs[-1][1] == offset and \
+               offset + bytecount - runs[-1][0] <= _READ_CHUNK:
+                runs[-1][1] += bytecount
+                runs[-1][-1] += 1
+            else:
+                runs.append([offset, offset + bytecount, 1])
+        data, position, i = [], 0, 0
+        for start, stop, count in runs:
+            source.readinto(start, view[position:position + stop - start])
+            for offset, bytecount in blocks[i:i + count]:
+                data.append(view[position:position + bytecount])
+                position += bytecount
+            i += count
+        return tuple(data), raster
+    # sort ranges by offset so merged reads are as large as possible
+    ranges = sorted(
+        (offset, bytecount, i) for i, (offset, bytecount) in enumerate(blocks)
+    )
+    data = [None] * len(blocks)
+    for start, stop, members in _coalesce(ranges, _READ_GAP, _READ_CHUNK):
+        chunk = source.read(start, stop - start)
+        if len(members) == 1 and members[0][1] == len(chunk):
+            data[members[0][-1]] = chunk
+            continue
+        view = memoryview(chunk)
+        for offset, bytecount, i in members:
+            data[i] = view[offset - start:offset - start + bytecount]
+    return tuple(data)
+
+
+def _dtype(obj, samples):
+    """
+    Return `numpy.dtype` of IFD samples, all samples sharing the same bit
+    count and format.
+    """
+    import numpy
+
+    bits = obj["BitsPerSample"] if "BitsPerSample" in obj else 1
+    fmt = obj["SampleFormat"] if "SampleFormat" in obj else 1
+    bits = set(bits) if isinstance(bits, tuple) else set([bits])
+    fmt = set(fmt) if isinstance(fmt, tuple) else set([fmt])
+    if len(bits) > 1 or len(fmt) > 1:
+        raise ValueError("samples of different types not supported")
+    bits, fmt = bits.pop(), fmt.pop()
+    if bits not in (8, 16, 32, 64) or fmt not in (1, 2, 3) or \
+       (fmt == 3 and bits == 8):
+        raise ValueError(
+            "%d-bit samples of format %d not supported" % (bits, fmt)
+        )
+    return numpy.dtype(
+        "%s%s%d" % (
+            getattr(obj, "_byteorder", "<"), " uif"[fmt], bits // 8
+        )
+    )
+
+
+def _raster_geometry(obj):
+    """
+    Return raster attribute name, samples per pixel, planar flag, block
+    width and length and block count across and down the image of an IFD
+    raster. Planar rasters hold `samples` times this block count.
+    """
+    width, length = obj["ImageWidth"], obj["ImageLength"]
+    samples = obj["SamplesPerPixel"] if "SamplesPerPixel" in obj else 1
+    planar = "PlanarConfiguration" in obj and \
+        obj["PlanarConfiguration"] == 2
+    # strips are blocks of the full image width
+    if "TileWidth" in obj:
+        name = "tiles"
+        bwidth, blength = obj["TileWidth"], obj["TileLength"]
+    else:
+        name = "stripes"
+        bwidth = width
+        blength = obj["RowsPerStrip"] if "RowsPerStrip" in obj else length
+        blength = min(blength, length)
+    return (
+        name, samples, planar, bwidth, blength,
+        -(-width // bwidth), -(-length // blength)
+    )
+
+
+def _raster_layout(obj):
+    """
+    Return raster attribute name, `numpy.dtype`, samples per pixel, planar
+    flag, block width and length and block count across and down the image
+    of an IFD raster.
+    """
+    geometry = _raster_geometry(obj)
+    return geometry[:1] + (_dtype(obj, geometry[1]), ) + geometry[1:]
+
+
+def _codec_args(obj):
+    """
+    Return `Tyf.compression.decode` keyword arguments for IFD raster blocks.
+    """
+    bits = obj["BitsPerSample"] if "BitsPerSample" in obj else 1
+    planar = "PlanarConfiguration" in obj and \
+        obj["PlanarConfiguration"] == 2
+    return dict(
+        compression=obj["Compression"] if "Compression" in obj else 1,
+        predictor=obj["Predictor"] if "Predictor" in obj else 1,
+        width=obj["TileWidth"] if "TileWidth" in obj else
+        obj["ImageWidth"],
+        samples=1 if planar or "SamplesPerPixel" not in obj else
+        obj["SamplesPerPixel"],
+        bits=bits[0] if isinstance(bits, tuple) else bits,
+        byteorder=getattr(obj, "_byteorder", "<")
+    )
+
+
+def _raster_buffer(obj, name, row_size):
+    """
+    Return a buffer holding the whole `name` raster of IFD if strips follow
+    each other with no padding, `None` otherwise. No data is copied when
+    raster is loaded in one buffer or when source is memory-mapped.
+    """
+    offsets, bytecounts = [r[1:] for r in _RASTERS if r[0] == name][0]
+    if name != "stripes" or offsets not in obj or \
+       "Compression" in obj and obj["Compression"] != 1:
+        return None
+    blocks = _raster_blocks(obj)[-1]
+    length = obj["ImageLength"]
+    rows = obj["RowsPerStrip"] if "RowsPerStrip" in obj else length
+    rows = min(rows, length)
+    # strip sizes must be the ones expected except the last one of planes
+    expected = [
+        min(rows, length - row) * row_size for row in range(0, length, rows)
+    ]
+    if len(blocks) % len(expected) or any(
+        bytecount != expected[i % len(expected)] for i, (offset, bytecount)
+        in enumerate(blocks[:-1])
+    ) or blocks[-1][-1] < expected[-1]:
+        return None
+    loaded = obj.__dict__.get(name)
+    if loaded is not None:
+        if getattr(obj, "raster", None) is not None:
+            return obj.raster
+        elif len(loaded) == 1:
+            return loaded[0]
+        return None
+    elif any(
+        blocks[i][0] + blocks[i][-1] != blocks[i + 1][0]
+        for i in range(len(blocks) - 1)
+    ):
+        return None
+    source = getattr(obj, "_source", None)
+    if source is None:
+        raise ValueError("raster not loaded and no source file to read")
+    start = blocks[0][0]
+    return source.read(start, blocks[-1][0] - start + expected[-1])
+
+
 # for speed reason : load raster only if asked or if needed
-def _load_raster(obj, fileobj):
-    # striped raster data
-    if "StripOffsets" in obj:
-        setattr(obj, "stripes", tuple())
-        offsets = obj["StripOffsets"]
-        bytescounts = obj["StripByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
-        else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.stripes += (fileobj.read(bytecount), )
-    # free raster data
-    elif "FreeOffsets" in obj:
-        setattr(obj, "free", tuple())
-        offsets = obj["FreeOffsets"]
-        bytescounts = obj["FreeByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
-        else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.free += (fileobj.read(bytecount), )
-    # tiled raster data
-    elif "TileOffsets" in obj:
-        setattr(obj, "tiles", tuple())
-        offsets = obj["TileOffsets"]
-        bytescounts = obj["TileByteCounts"]
-        if isinstance(offsets, tuple):
-            data = zip(offsets, bytescounts)
+def _load_raster(obj, source, contiguous=False):
+    name, blocks = _raster_blocks(obj)
+    if name is not None:
+        if contiguous:
+            data, obj.raster = _read_blocks(source, blocks, True)
         else:
-            data = ((offsets, bytescounts), )
-        for offset, bytecount in data:
-            fileobj.seek(offset)
-            obj.tiles += (fileobj.read(bytecount), )
+            data = _read_blocks(source, blocks)
+        setattr(obj, name, data)
     # get interExchange (thumbnail data for JPEG/EXIF data)
     if "JPEGInterchangeFormat" in obj:
-        fileobj.seek(obj["JPEGInterchangeFormat"])
-        obj.jpegIF = fileobj.read(obj["JPEGInterchangeFormatLength"])
+        obj.jpegIF = source.read(
+            obj["JPEGInterchangeFormat"], obj["JPEGInterchangeFormatLength"]
+        )
+
+
+def _own_raster(obj):
+    """
+    Replace loaded raster blocks that are slices of a memory map by `bytes`
+    copies, so they stay valid when the mapped file is overwritten.
+    """
+    for name in ["stripes", "tiles", "free"]:
+        blocks = obj.__dict__.get(name, ())
+        if any(
+            isinstance(b, memoryview) and isinstance(b.obj, mmap.mmap)
+            for b in blocks
+        ):
+            setattr(obj, name, tuple(bytes(b) for b in blocks))
+    jpeg = obj.__dict__.get("jpegIF")
+    if isinstance(jpeg, memoryview) and isinstance(jpeg.obj, mmap.mmap):
+        obj.jpegIF = bytes(jpeg)
+
+
+def _is_dirty(obj):
+    """
+    Return `True` if a tag value of IFD or sub IFD was set, or a tag added or
+    removed, since it was read or marked clean.
+    """
+    return any(
+        i._dirty for i in [obj] + [
+            getattr(obj, name) for name in ["exfT", "gpsT", "itrT"]
+            if hasattr(obj, name)
+        ]
+    ) or any(getattr(tag, "_dirty", False) for tag in obj.tags())
+
+
+def _clean(obj):
+    "Mark IFD, its sub IFD and tags as unchanged (see `_is_dirty`)."
+    for name in ["exfT", "gpsT", "itrT"]:
+        if hasattr(obj, name):
+            getattr(obj, name).__dict__.pop("_dirty", None)
+    obj.__dict__.pop("_dirty", None)
+    for tag in obj.tags():
+        tag._dirty = False
+
+
+def _copy(obj, raster=False):
+    """
+    Return a copy of IFD made of tag and sub IFD copies, so it can be edited
+    or written without changing `obj`. Raster data is not copied: if
+    `raster` is `True`, loaded blocks and source reader are shared so the
+    copy reads the same raster.
+    """
+    result = Ifd(tag_family=list(obj.tag_family))
+    for key, tag in dict.items(obj):
+        dict.__setitem__(result, key, copy.copy(tag))
+    for name in ["exfT", "gpsT", "itrT"]:
+        if hasattr(obj, name):
+            setattr(result, name, _copy(getattr(obj, name)))
+    if raster:
+        for name in [
+            "_source", "_blocks", "_byteorder", "stripes", "tiles", "free",
+            "jpegIF"
+        ]:
+            if name in obj.__dict__:
+                setattr(result, name, obj.__dict__[name])
+    return result
+
+
+def _load_values(obj):
+    """
+    Fetch all tag values not loaded yet, including sub IFD ones. Values are
+    read in offset order, merging neighbouring ones.
+    """
+    ranges = {}
+    for tag in obj.tags():
+        if hasattr(tag, "_ref"):
+            source, byteorder, offset, count = tag._ref
+            fmt = _value_struct(byteorder, tag.type, count)
+            ranges.setdefault(id(source), (source, []))[-1].append(
+                (offset, fmt.size, (tag, fmt))
+            )
+    for source, items in ranges.values():
+        items.sort(key=lambda r: r[0])
+        for start, stop, members in _coalesce(items, _READ_GAP):
+            data = source.read(start, stop - start)
+            for offset, size, (tag, fmt) in members:
+                tag._unpack(data, offset - start, fmt)
 
 
 def getModelTiePoints(cls):
@@ -364,6 +760,8 @@ class Ifd(dict):
         lambda cls: getModelTiePoints(cls),
         None, None, ""
     )
+    #: set by tag additions and removals (see `_is_dirty`)
+    _dirty = False
 
     def __init__(self, **kwargs):
         dict.__init__(self)
@@ -372,6 +770,7 @@ class Ifd(dict):
         )
 
     def __delattr__(self, attr):
+        self._dirty = True
         if attr == "gpsT":
             dict.pop(self, "GPS IFD", False)
         elif attr == "exfT":
@@ -398,6 +797,7 @@ class Ifd(dict):
         raise KeyError("%s tag not found" % key)
 
     def __delitem__(self, tag):
+        self._dirty = True
         tag, (key, typ, default, comment) = tags.get(tag)
         if key in self:
             return dict.__delitem__(self, key)
@@ -414,6 +814,7 @@ class Ifd(dict):
         tag = Tag(tag)
         tag.type = typ
         tag.value = value
+        self._dirty = True
         return dict.__setitem__(self, tag.key, tag)
 
     def get(self, tag, default=None):
@@ -428,6 +829,7 @@ class Ifd(dict):
         raise KeyError("%s tag not found" % key)
 
     def pop(self, tag, default=None):
+        self._dirty = True
         tag, (key, typ, default, comment) = tags.get(tag)
         if key in self:
             return dict.pop(self, key)
@@ -442,6 +844,10 @@ class Ifd(dict):
         return default
 
     def append(self, tag):
+        self._dirty = True
+        self._append(tag)
+
+    def _append(self, tag):
         for family in self.tag_family:
             if tags.in_family(tag.key, family):
                 return dict.__setitem__(self, tag.key, tag)
@@ -464,18 +870,18 @@ class Ifd(dict):
                     yield v
     __iter__ = tags
 
-    def pack(self, byteorder):
+    def pack(self, byteorder, bigtiff=False):
         result = {}
 
         for name in [n for n in ["exfT", "gpsT", "itrT"] if hasattr(self, n)]:
-            result[name] = getattr(self, name).pack(byteorder)["root"]
+            result[name] = getattr(self, name).pack(byteorder, bigtiff)["root"]
 
         tags = [
-            t.pack(byteorder) for t in
+            t.pack(byteorder, bigtiff) for t in
             sorted(self.values(), key=lambda e: e.tag)
         ]
 
-        ifd_size = struct.calcsize("=H" + len(tags) * "HHLL" + "L")
+        ifd_size = _ifd_size(len(tags), bigtiff)
         ifd_data = b"".join(t[1] for t in tags if t[-1])
 
         raster_length = set([
@@ -604,6 +1010,10 @@ class Ifd(dict):
         Returns:
             bytes|str: Image data.
         """
+        try:
+            from urllib.request import urlopen
+        except ImportError:
+            from urllib import urlopen
         lon, lat, alt = self.get_location()
         kwargs.update(lon=lon, lat=lat, alt=alt)
         try:
@@ -653,6 +1063,244 @@ class Ifd(dict):
             )
         return lambda x, y, z=0., m=matrix: Transform(m, x, y, z)
 
+    def read_strip(self, index, decode=False):
+        """
+        Return raw data of one strip, from loaded raster if any or else from
+        source file through `Tyf.TiffFile` block cache. If `decode` is
+        `True`, data is decompressed according to `Compression` and
+        `Predictor` tags (see `Tyf.compression`).
+
+        ```python
+        >>> tif = Tyf.open("test/CEA.tif")
+        >>> len(tif[0].read_strip(0))
+        7710
+        >>> tif.block_cache
+        <LRU 7710/67108864 hits=0 misses=1 evictions=0>
+        ```
+
+        Args:
+            index (int): strip index.
+            decode (bool): decompress strip data.
+
+        Returns:
+            bytes: strip data.
+
+        Raises:
+            ValueError: if compression is not supported.
+        """
+        return self._read_block("stripes", index, decode)
+
+    def read_tile(self, index, decode=False):
+        """
+        Return raw data of one tile (see `Tyf.ifd.Ifd.read_strip`).
+
+        Args:
+            index (int): tile index, row by row from top left tile.
+            decode (bool): decompress tile data.
+
+        Returns:
+            bytes: tile data.
+        """
+        return self._read_block("tiles", index, decode)
+
+    def compress(self, compression=8, predictor=1, workers=None):
+        """
+        Load raster blocks and encode them again with another compression
+        and predictor, updating `Compression`, `Predictor` and byte count
+        tags. Use `compression=1` to store uncompressed raster. Blocks are
+        processed by `workers` if any (see `Tyf.compression.imap`).
+
+        ```python
+        >>> tif = Tyf.open("test/CEA.tif")
+        >>> tif[0].compress(5, predictor=2)  # LZW with differencing
+        >>> tif.save("CEA_lzw.tif")
+        ```
+
+        Args:
+            compression (int): `Compression` tag value.
+            predictor (int): `Predictor` tag value.
+            workers (int or concurrent.futures.Executor): thread count or
+                pool used to encode blocks.
+
+        Raises:
+            ValueError: if compression or predictor is not supported.
+        """
+        name, blocks = _raster_blocks(self)
+        if name not in ("stripes", "tiles"):
+            return
+        _compression._codec(compression)
+        if predictor != 1 and compression in (1, 32773):
+            raise ValueError(
+                "predictor %s not supported with compression %s" %
+                (predictor, compression)
+            )
+        decoding = _codec_args(self)
+        encoding = dict(
+            decoding, compression=compression, predictor=predictor
+        )
+        data = tuple(_compression.imap(
+            functools.partial(
+                _compression.recode, decoding=decoding, encoding=encoding
+            ),
+            (self._read_block(name, index) for index in range(len(blocks))),
+            workers
+        ))
+        self.__dict__.pop("raster", None)
+        setattr(self, name, data)
+        bytecounts = [r[2] for r in _RASTERS if r[0] == name][0]
+        self.set(
+            bytecounts, 4,
+            tuple(len(block) for block in data) if len(data) > 1 else
+            len(data[0])
+        )
+        self.set("Compression", 3, compression)
+        if predictor != 1:
+            self.set("Predictor", 3, predictor)
+        elif "Predictor" in self:
+            self.pop("Predictor")
+
+    def as_array(self, workers=None):
+        """
+        Return raster as a `numpy.ndarray` of shape
+        `(length, width)`, `(length, width, samples)` for chunky pixels or
+        `(samples, length, width)` for planar ones. Data type follows
+        `BitsPerSample`, `SampleFormat` and file byte order. Array shares
+        memory with uncompressed raster data when it is held in a single
+        buffer (mmap source, `contiguous` raster load or strips following
+        each other in file), else blocks are decoded into a new array.
+
+        ```python
+        >>> tif = Tyf.open("test/float32.tif", mmap=True)
+        >>> a = tif[0].as_array()
+        >>> a.shape, a.dtype
+        ((170, 250), dtype('float32'))
+        ```
+
+        Args:
+            workers (int or concurrent.futures.Executor): thread count or
+                pool used to decode compressed blocks.
+
+        Returns:
+            numpy.ndarray: raster array.
+
+        Raises:
+            ImportError: if numpy is not installed.
+            ValueError: if compression is not supported or samples are not
+                bytes aligned.
+        """
+        import numpy
+
+        layout = _raster_layout(self)
+        name, dtype, samples, planar = layout[:4]
+        width, length = self["ImageWidth"], self["ImageLength"]
+        depth = 1 if planar else samples
+        buffer = _raster_buffer(self, name, dtype.itemsize * depth * width)
+        if buffer is not None:
+            return numpy.frombuffer(
+                buffer, dtype, count=samples * length * width
+            ).reshape(
+                (samples, length, width) if planar else
+                (length, width, samples) if samples > 1 else (length, width)
+            )
+        return self.read_window(0, 0, width, length, workers)
+
+    def read_window(self, col, row, width, height, workers=None):
+        """
+        Return a window of raster as a `numpy.ndarray` shaped
+        like `Tyf.ifd.Ifd.as_array` output. Only the strips or tiles
+        intersecting the window are read, through `Tyf.TiffFile` block
+        cache. Strips span the whole image width, so tiled rasters are the
+        ones where bytes read scale with window size only.
+
+        ```python
+        >>> tif = Tyf.open("test/CEA.tif")
+        >>> tif[0].read_window(256, 256, 64, 32).shape
+        (32, 64)
+        ```
+
+        Args:
+            col (int): left pixel column.
+            row (int): top pixel row.
+            width (int): window width in pixel.
+            height (int): window height in pixel.
+            workers (int or concurrent.futures.Executor): thread count or
+                pool used to decode compressed blocks (see
+                `Tyf.compression.imap`).
+
+        Returns:
+            numpy.ndarray: window array.
+
+        Raises:
+            ImportError: if numpy is not installed.
+            ValueError: if compression is not supported, samples are not
+                bytes aligned or window is not within raster.
+        """
+        import numpy
+
+        name, dtype, samples, planar, bwidth, blength, across, down = \
+            _raster_layout(self)
+        if width <= 0 or height <= 0 or col < 0 or row < 0 or \
+           col + width > self["ImageWidth"] or \
+           row + height > self["ImageLength"]:
+            raise ValueError("window is not within raster")
+        depth = 1 if planar else samples
+        planes = samples if planar else 1
+        size = blength * bwidth * depth
+        array = numpy.empty((planes, height, width, depth), dtype)
+        rows = range(row // blength, (row + height - 1) // blength + 1)
+        cols = range(col // bwidth, (col + width - 1) // bwidth + 1)
+        blocks = [
+            (plane, brow, bcol)
+            for plane in range(planes) for brow in rows for bcol in cols
+        ]
+        chunks = (
+            self._read_block(name, (plane * down + brow) * across + bcol)
+            for plane, brow, bcol in blocks
+        )
+        args = _codec_args(self)
+        if args["compression"] != 1:
+            chunks = _compression.imap(
+                functools.partial(_compression.decode, **args), chunks,
+                workers
+            )
+        for (plane, brow, bcol), data in zip(blocks, chunks):
+            # last strip may be shorter than the others
+            count = min(len(data) // dtype.itemsize, size) // (bwidth * depth)
+            block = numpy.frombuffer(
+                data, dtype, count=count * bwidth * depth
+            ).reshape(count, bwidth, depth)
+            top, left = brow * blength, bcol * bwidth
+            y0, y1 = max(row, top), min(row + height, top + count)
+            x0, x1 = max(col, left), min(col + width, left + bwidth)
+            array[plane, y0 - row:y1 - row, x0 - col:x1 - col] = \
+                block[y0 - top:y1 - top, x0 - left:x1 - left]
+        return array[..., 0] if planar else \
+            array[0] if samples > 1 else array[0, ..., 0]
+
+    def _read_block(self, name, index, decode=False):
+        if decode:
+            data = self._read_block(name, index)
+            args = _codec_args(self)
+            return data if args["compression"] == 1 else \
+                _compression.decode(data, **args)
+        elif name in self.__dict__:
+            return self.__dict__[name][index]
+        offsets, bytecounts = [r[1:] for r in _RASTERS if r[0] == name][0]
+        offsets, bytecounts = self[offsets], self[bytecounts]
+        if not isinstance(offsets, tuple):
+            offsets, bytecounts = (offsets, ), (bytecounts, )
+        key = offsets[index], bytecounts[index]
+        source = getattr(self, "_source", None)
+        if source is None:
+            raise ValueError("raster not loaded and no source file to read")
+        blocks = getattr(self, "_blocks", None)
+        if blocks is None:
+            return source.read(*key)
+        data = blocks.get(key)
+        if data is None:
+            data = blocks[key] = source.read(*key)
+        return data
+
 
 def dump_mapbox_location(cls, name, zoom=15, width=400, height=300, token=""):
     """
@@ -0,0 +1,86 @@
+# -*- encoding:utf-8 -*-
+"""
+Pillow overridings: EXIF and XMP data of JPEG images opened with Pillow are
+exposed as `ifd` and `xmp` attributes and written back on save. This module
+is imported by `Tyf` once `PIL.Image` and the Pillow module importing it are
+loaded.
+"""
+
+import io
+import os
+
+import xml.etree.ElementTree as ET
+
+from PIL import Image as _Image
+from Tyf import TiffFile, StringIO
+
+
+def _getmeta(im):
+    for _, data in im.applist:
+        if data[:6] == b'Exif\x00\x00':
+            fileobj = io.BytesIO(data[6:])
+            setattr(im, "ifd", TiffFile(fileobj))
+            fileobj.close()
+        elif data[:29] == b'http://ns.adobe.com/xap/1.0/\x00':
+            setattr(im, "xmp", ET.fromstring(data[29:]))
+
+
+def _getexif(im):
+    if not hasattr(im, "ifd"):
+        try:
+            data = im.info["exif"]
+        except KeyError:
+            return None
+        # b'Exif\x00\x00' -> 6 bytes
+        fileobj = io.BytesIO(data[6:])
+        setattr(im, "ifd", TiffFile(fileobj))
+        fileobj.close()
+        del fileobj
+    return im.ifd
+
+
+class Image(_Image.Image):
+    """
+    Pillow Image class override.
+    """
+
+    # keep a reference of original PIL Image object
+    _image_ = _Image.Image
+
+    @staticmethod
+    def open(*args, **kwargs):
+        img = _Image.open(*args, **kwargs)
+        img._getmeta()
+        return img
+
+    def save(self, fp, format=None, **params):
+        if (
+            isinstance(fp, str) and
+            os.path.splitext(fp)[-1].lower() in [".jpg", ".jpeg"]
+            or
+            isinstance(format, str) and
+            format.lower() == "jpeg"
+        ) and not params.pop("strip_exif", False):
+            self._getexif()
+            stringio = StringIO()
+            self.ifd.save(stringio, idx=0, ifd1=self.ifd[1])
+            data = stringio.getvalue()
+            params["exif"] = b'Exif\x00\x00' + (
+                data if isinstance(data, bytes) else
+                data.encode("utf-8")
+            )
+            stringio.close()
+            del stringio, data
+        if hasattr(self, "xmp"):
+            params["xmp"] = b'http://ns.adobe.com/xap/1.0/\x00' + \
+                ET.tostring(self.xmp)
+        return Image._image_.save(self, fp, format, **params)
+
+
+#: Pillow override
+_Image.Image = Image
+
+from PIL import JpegImagePlugin
+JpegImagePlugin._getexif = _getexif
+JpegImagePlugin.JpegImageFile._getmeta = _getmeta
+del _getexif, _getmeta
@@ -0,0 +1,187 @@
+# -*- encoding:utf-8 -*-
+"""
+`Tyf.sidecar` module manages `.tyfidx` index files stored next to TIFF files.
+An index holds the offsets of all IFD and a few fields of each of them, so
+any page of a huge multi-page file is reached without following the IFD
+chain. It is valid as long as TIFF file size and modification time are the
+ones recorded.
+
+Index file is made of a JSON header line, a table of IFD offsets, a table
+of record positions and one JSON record of fields per IFD. Tables are
+little-endian unsigned 64-bit integers so any item is read with a single
+read, whatever the page count.
+
+```python
+>>> from Tyf import sidecar
+>>> idx = sidecar.build("test/CEA.tif")  # writes test/CEA.tif.tyfidx
+>>> idx.fields(0)["ImageWidth"]
+514
+>>> tif = Tyf.open("test/CEA.tif")  # index is used if valid
+>>> tif.index
+<Tyf.sidecar.Index 1 IFD>
+```
+"""
+
+import os
+import json
+import struct
+
+import Tyf
+from Tyf import source
+
+#: index format version
+VERSION = 1
+#: sidecar file extension
+EXTENSION = ".tyfidx"
+#: fields stored for each IFD by default
+FIELDS = (
+    "ImageWidth", "ImageLength", "BitsPerSample", "SamplesPerPixel",
+    "Compression", "PhotometricInterpretation", "PlanarConfiguration",
+    "RowsPerStrip", "TileWidth", "TileLength", "SampleFormat"
+)
+
+_Q = struct.Struct("<Q")
+
+
+def path(filename):
+    "Return sidecar index path of a TIFF file."
+    return filename + EXTENSION
+
+
+def _stamp(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Index(object):
+    """
+    Read access to a sidecar index file. Length is the IFD count and items
+    are IFD offsets.
+
+    Args:
+        filename (str): sidecar index path.
+
+    Raises:
+        ValueError: if file is not a valid index.
+    """
+
+    def __init__(self, filename):
+        self._reader = source.File(filename)
+        line = bytes(self._reader.read(0, 4096))
+        while b"\n" not in line and len(line) % 4096 == 0 and line:
+            line += bytes(self._reader.read(len(line), 4096))
+        if b"\n" not in line:
+            self._reader.close()
+            raise ValueError("not a valid index file")
+        line = line[:line.index(b"\n") + 1]
+        #: header with TIFF file size, modification time and layout
+        self.header = json.loads(line.decode("utf-8"))
+        self._count = self.header["count"]
+        self._offsets = len(line)
+        self._positions = self._offsets + _Q.size * self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("index out of range")
+        return _Q.unpack(
+            self._reader.read(self._offsets + _Q.size * item, _Q.size)
+        )[0]
+
+    def __repr__(self):
+        return "<Tyf.sidecar.Index %d IFD>" % self._count
+
+    def fields(self, item):
+        "Return fields recorded for IFD `item` as a dictionary."
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("index out of range")
+        start, stop = struct.unpack(
+            "<2Q", self._reader.read(self._positions + _Q.size * item, 16)
+        )
+        values = json.loads(
+            bytes(self._reader.read(start, stop - start)).decode("utf-8")
+        )
+        return dict(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in zip(self.header["fields"], values)
+            if value is not None
+        )
+
+    def close(self):
+        self._reader.close()
+
+
+def build(filename, fields=FIELDS):
+    """
+    Walk the whole IFD chain of a TIFF file and write its sidecar index.
+
+    Args:
+        filename (str): TIFF file path.
+        fields (list): tag keys to store for each IFD.
+
+    Returns:
+        Tyf.sidecar.Index: the index written.
+    """
+    fields = list(fields)
+    size, mtime_ns = _stamp(filename)
+    tif = Tyf.open(filename, tags=fields, index=False)
+    records = []
+    for page in tif:
+        records.append(json.dumps([
+            page[key] if key in dict.keys(page) else None for key in fields
+        ], separators=(",", ":")).encode("utf-8") + b"\n")
+    tif.close()
+    header = json.dumps({
+        "version": VERSION,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "byteorder": tif._byteorder,
+        "bigtiff": tif.bigtiff,
+        "count": len(records),
+        "fields": fields,
+    }).encode("utf-8") + b"\n"
+    # record positions follow header, offset and position tables
+    position = len(header) + _Q.size * (2 * len(records) + 1)
+    positions = [position]
+    for record in records:
+        position += len(record)
+        positions.append(position)
+    # write a temporary file and rename it so readers never see half index
+    tmp = path(filename) + ".tmp"
+    with open(tmp, "wb") as out:
+        out.write(header)
+        out.write(struct.pack("<%dQ" % len(records), *tif._offsets))
+        out.write(struct.pack("<%dQ" % len(positions), *positions))
+        out.writelines(records)
+    os.replace(tmp, path(filename))
+    return Index(path(filename))
+
+
+def load(filename):
+    """
+    Return sidecar index of a TIFF file or `None` if there is no index or if
+    it does not match the file size and modification time anymore.
+
+    Args:
+        filename (str): TIFF file path.
+
+    Returns:
+        Tyf.sidecar.Index: the index found.
+    """
+    try:
+        index = Index(path(filename))
+        size, mtime_ns = _stamp(filename)
+    except (OSError, ValueError, KeyError):
+        return None
+    header = index.header
+    if header.get("version") != VERSION or header.get("size") != size or \
+       header.get("mtime_ns") != mtime_ns:
+        index.close()
+        return None
+    return index
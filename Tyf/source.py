@@ -0,0 +1,301 @@
+# -*- encoding:utf-8 -*-
+"""
+`Tyf.source` module defines random access readers used to fetch IFD values
+and raster data on demand, once the file object given to `Tyf.open` is gone.
+"""
+
+import os
+import io
+import mmap
+import threading
+
+#: chunk size used when data has to be copied through user space
+CHUNK = 1 << 20
+
+
+def _copy_file_range(src, dst, offset, size, position):
+    return os.copy_file_range(src, dst, size, offset, position)
+
+
+def _sendfile(src, dst, offset, size, position):
+    os.lseek(dst, position, os.SEEK_SET)
+    return os.sendfile(dst, src, offset, size)
+
+
+#: kernel-side copies, tried in order
+_KERNEL_COPIES = [
+    function for name, function in [
+        ("copy_file_range", _copy_file_range), ("sendfile", _sendfile)
+    ] if hasattr(os, name)
+]
+
+
+def _kernel_copy(src, dst, offset, size, position):
+    # copy until done, end of file or an unsupported case (cross-device,
+    # special files...) where next function takes over
+    copied = 0
+    for function in _KERNEL_COPIES:
+        try:
+            while copied < size:
+                count = function(
+                    src, dst, offset + copied, size - copied, position + copied
+                )
+                if not count:
+                    return copied
+                copied += count
+            return copied
+        except OSError:
+            continue
+    return copied
+
+
+def _write(fileobj, data):
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK):
+        fileobj.write(view[start:start + CHUNK])
+    return len(view)
+
+
+class Buffer(object):
+    """
+    Random access reader over in-memory data.
+
+    Args:
+        data (bytes): file content.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, offset, size):
+        "Return `size` bytes found at `offset`."
+        return self.data[offset:offset + size]
+
+    def readinto(self, offset, view):
+        "Copy bytes found at `offset` into `view` and return their count."
+        data = self.data[offset:offset + len(view)]
+        view[:len(data)] = data
+        return len(data)
+
+    def copy(self, offset, size, fileobj):
+        "Write `size` bytes found at `offset` into `fileobj`."
+        return _write(fileobj, memoryview(self.data)[offset:offset + size])
+
+    def close(self):
+        pass
+
+
+class File(object):
+    """
+    Random access reader over a file path. The file is opened on first read
+    and kept opened until `close` is called; it is reopened if needed. Reads
+    use `os.pread` when available so no seek is shared between threads.
+
+    Args:
+        path (str): a valid file path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fileobj = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return os.path.getsize(self.path)
+
+    def _open(self):
+        with self._lock:
+            if self._fileobj is None:
+                self._fileobj = io.open(self.path, "rb")
+        return self._fileobj
+
+    def read(self, offset, size):
+        "Return `size` bytes found at `offset`."
+        fileobj = self._fileobj or self._open()
+        if hasattr(os, "pread"):
+            data = os.pread(fileobj.fileno(), size, offset)
+            # pread may return less than asked on very large reads
+            while len(data) < size:
+                chunk = os.pread(
+                    fileobj.fileno(), size - len(data), offset + len(data)
+                )
+                if not chunk:
+                    break
+                data += chunk
+            return data
+        with self._lock:
+            fileobj.seek(offset)
+            return fileobj.read(size)
+
+    def readinto(self, offset, view):
+        "Read bytes found at `offset` into `view` and return their count."
+        fileobj = self._fileobj or self._open()
+        if hasattr(os, "preadv"):
+            size = 0
+            while size < len(view):
+                count = os.preadv(
+                    fileobj.fileno(), [view[size:]], offset + size
+                )
+                if not count:
+                    break
+                size += count
+            return size
+        data = self.read(offset, len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def copy(self, offset, size, fileobj):
+        """
+        Write `size` bytes found at `offset` into `fileobj` at its current
+        position and return their count. If `fileobj` is a file, data is
+        copied kernel-side with `os.copy_file_range` or `os.sendfile`, else
+        it is read and written `CHUNK` bytes at a time.
+        """
+        copied = 0
+        try:
+            dst = fileobj.fileno()
+        except (AttributeError, OSError):
+            dst = None
+        if dst is not None and _KERNEL_COPIES:
+            src = (self._fileobj or self._open()).fileno()
+            fileobj.flush()
+            position = fileobj.tell()
+            copied = _kernel_copy(src, dst, offset, size, position)
+            fileobj.seek(position + copied)
+        while copied < size:
+            data = self.read(offset + copied, min(CHUNK, size - copied))
+            if not data:
+                break
+            fileobj.write(data)
+            copied += len(data)
+        return copied
+
+    def close(self):
+        with self._lock:
+            if self._fileobj is not None:
+                self._fileobj.close()
+                self._fileobj = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class Map(File):
+    """
+    Random access reader over a memory-mapped file path. Reads return
+    `memoryview` slices of the map so no data is copied. The map is created
+    on first read; `close` releases it unless slices are still referenced.
+
+    Args:
+        path (str): a valid file path.
+    """
+
+    def _open(self):
+        with self._lock:
+            if self._fileobj is None:
+                with io.open(self.path, "rb") as fileobj:
+                    self._fileobj = memoryview(
+                        mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+        return self._fileobj
+
+    def read(self, offset, size):
+        "Return a `memoryview` on `size` bytes found at `offset`."
+        view = self._fileobj or self._open()
+        return view[offset:offset + size]
+
+    def readinto(self, offset, view):
+        "Copy bytes found at `offset` into `view` and return their count."
+        data = self.read(offset, len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def copy(self, offset, size, fileobj):
+        "Write `size` bytes found at `offset` into `fileobj` from the map."
+        return _write(fileobj, self.read(offset, size))
+
+    def close(self):
+        with self._lock:
+            if self._fileobj is not None:
+                view, self._fileobj = self._fileobj, None
+                mapped = view.obj
+                view.release()
+                try:
+                    mapped.close()
+                except BufferError:
+                    # slices still alive keep the map opened
+                    pass
+
+
+class Slice(object):
+    """
+    Reference to `size` bytes found at `offset` in a reader, fetched only
+    when needed.
+
+    Args:
+        reader (Buffer|File): random access reader.
+        offset (int): first byte position.
+        size (int): byte count.
+    """
+
+    #: chunk size used when streaming slice content
+    chunk = CHUNK
+
+    def __init__(self, reader, offset, size):
+        self.reader = reader
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __bytes__(self):
+        return bytes(self.reader.read(self.offset, self.size))
+
+    def __repr__(self):
+        return "<%s %d bytes at %d>" % (
+            self.__class__.__name__, self.size, self.offset
+        )
+
+    def chunks(self):
+        "Yield slice content `chunk` bytes at a time."
+        offset, stop = self.offset, self.offset + self.size
+        while offset < stop:
+            size = min(self.chunk, stop - offset)
+            data = self.reader.read(offset, size)
+            if not data:
+                break
+            yield data
+            offset += len(data)
+
+    def copy(self, fileobj):
+        """
+        Write slice content into `fileobj` without loading it and return
+        byte count written (see `File.copy`).
+        """
+        return self.reader.copy(self.offset, self.size, fileobj)
+
+
+def from_fileobj(fileobj, map=False, name_only=False):
+    """
+    Return a reader according to file object: a `File` (or a `Map` if asked)
+    if it is bound to a file path, else a `Buffer` filled with its content.
+
+    Args:
+        fileobj (IO[AnyStr]): a python file object.
+        map (bool): use a memory-mapped reader if possible.
+        name_only (bool): return None instead of a `Buffer`.
+    """
+    name = getattr(fileobj, "name", None)
+    if isinstance(name, (str, bytes)) and os.path.isfile(name):
+        return Map(name) if map else File(name)
+    if name_only:
+        return None
+    fileobj.seek(0)
+    return Buffer(fileobj.read())
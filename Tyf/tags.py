@@ -1,10 +1,10 @@
 # -*- encoding:utf-8 -*-
 
 import os
+import types
 import pickle
 import sqlite3
-
-from functools import reduce
+import threading
 
 
 def to_sqlite(elem):
@@ -20,20 +20,77 @@ sqlite3.register_adapter(tuple, to_sqlite)
 sqlite3.register_adapter(bytes, to_sqlite)
 sqlite3.register_converter('BLOB', to_python)
 
-sqlite = sqlite3.connect(
-    os.path.join(os.path.dirname(__file__), "tags.sqlite"),
-    detect_types=sqlite3.PARSE_DECLTYPES
-)
+
+def _compile(connection):
+    """
+    Load the whole tag registry once and return immutable indexes by tag
+    number, by key and by family. Rows are read in insertion order so the
+    first definition wins, as the former `SELECT` did.
+    """
+    by_tag, by_key, families, keys = {}, {}, {}, {}
+    for family, tag, key, typ, default, comment in connection.execute(
+        "SELECT family, tag, key, type, _default, comment FROM tags "
+        "ORDER BY rowid"
+    ):
+        entry = (tag, (key, typ, default, comment))
+        by_tag.setdefault(tag, entry)
+        by_key.setdefault(key, entry)
+        families.setdefault(family, set()).update([tag, key])
+        keys[family] = keys.get(family, ()) + (key, )
+    return (
+        types.MappingProxyType(by_tag),
+        types.MappingProxyType(by_key),
+        types.MappingProxyType(
+            dict((f, frozenset(s)) for f, s in families.items())
+        ),
+        types.MappingProxyType(keys)
+    )
+
+
+# indexes are built on first use, the lock only guards that first load
+_TAGS = _KEYS = _FAMILIES = _FAMILY_KEYS = None
+_lock = threading.Lock()
+
+
+def _load():
+    """
+    Build registry indexes from `tags.sqlite`. The connection is opened and
+    closed by the loading thread so no sqlite handle is shared between
+    threads or inherited by forked processes.
+    """
+    global _TAGS, _KEYS, _FAMILIES, _FAMILY_KEYS
+    with _lock:
+        if _TAGS is None:
+            connection = sqlite3.connect(
+                os.path.join(os.path.dirname(__file__), "tags.sqlite"),
+                detect_types=sqlite3.PARSE_DECLTYPES
+            )
+            try:
+                indexes = _compile(connection)
+            finally:
+                connection.close()
+            # _TAGS is the "loaded" flag read without lock: publish it last
+            _KEYS, _FAMILIES, _FAMILY_KEYS = indexes[1:]
+            _TAGS = indexes[0]
+
+
+def _reset_lock():
+    # a lock held by another thread at fork time would never be released in
+    # the child process
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock)
 
 
 def get(tag_or_key):
-    req = sqlite.execute(
-        "SELECT * FROM tags WHERE tag=? OR key=?",
-        (tag_or_key, tag_or_key)
-    ).fetchall()
-    if len(req):
-        data = req[0]
-        return data[1], (data[2], data[3], data[4], data[5])
+    if _TAGS is None:
+        _load()
+    entry = _TAGS.get(tag_or_key, None) or _KEYS.get(tag_or_key, None)
+    if entry is not None:
+        return entry
     else:
         return False, (
             "Undefined", [7], None, "Undefined tag %r" % tag_or_key
@@ -41,18 +98,12 @@ def get(tag_or_key):
 
 
 def in_family(tag_or_key, family):
-    return len(
-        sqlite.execute(
-            "SELECT * FROM tags WHERE family=? and (tag=? OR key=?)",
-            (family, tag_or_key, tag_or_key)
-        ).fetchall()
-    ) > 0
+    if _TAGS is None:
+        _load()
+    return tag_or_key in _FAMILIES.get(family, ())
 
 
 def keys(family):
-    return reduce(
-        tuple.__add__,
-        sqlite.execute(
-            "SELECT key FROM tags WHERE family=?", (family,)
-        ).fetchall()
-    )
+    if _TAGS is None:
+        _load()
+    return _FAMILY_KEYS.get(family, ())
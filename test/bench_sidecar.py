@@ -0,0 +1,114 @@
+# -*- encoding:utf-8 -*-
+"""
+Benchmark random page access of a 10,000 pages TIFF file with and without
+its `Tyf.sidecar` index: each access opens the file and reads a tag of a
+random page among the last thousand ones. Reads are counted on the TIFF
+file only.
+
+```
+$ python test/bench_sidecar.py
+no index    20.95 ms    18950 reads    63 kB per access
+build      365.08 ms      537 kB index
+index        0.08 ms        5 reads     8 kB per access
+```
+"""
+
+import os
+import io
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Tyf  # noqa: E402
+from Tyf import ifd, source, sidecar  # noqa: E402
+
+PAGES = 10000
+ACCESSES = 20
+
+
+def make_file(path):
+    "Write a `PAGES` pages TIFF file of 8x8 gray images."
+    template = ifd.Ifd()
+    template.set("ImageWidth", 4, 8)
+    template.set("ImageLength", 4, 8)
+    template.set("BitsPerSample", 3, 8)
+    template.set("SamplesPerPixel", 3, 1)
+    template.set("PhotometricInterpretation", 3, 1)
+    template.set("RowsPerStrip", 4, 8)
+    buffer = io.BytesIO()
+    with Tyf.TiffWriter(buffer, template) as writer:
+        writer.write_block(0, bytes(64))
+    buffer.seek(0)
+    tif = Tyf.TiffFile(buffer)
+    pages = [ifd._copy(tif[0], raster=True) for _ in range(PAGES - 1)]
+    tif.extend(pages)
+    for i, page in enumerate(tif):
+        page["ImageDescription"] = "page %d" % i
+    tif.save(path)
+
+
+class Counter(object):
+    "Count reads and bytes read by `Tyf.source.File` readers."
+
+    def __init__(self):
+        self.reads = self.size = 0
+
+    def __enter__(self):
+        self.saved = source.File.read, source.File.readinto
+        read, readinto = self.saved
+
+        def counted_read(reader, offset, size):
+            self.reads += 1
+            self.size += size
+            return read(reader, offset, size)
+
+        def counted_readinto(reader, offset, view):
+            self.reads += 1
+            self.size += len(view)
+            return readinto(reader, offset, view)
+
+        source.File.read = counted_read
+        source.File.readinto = counted_readinto
+        return self
+
+    def __exit__(self, *args):
+        source.File.read, source.File.readinto = self.saved
+
+
+def bench(path, label):
+    rand = random.Random(1)
+    indexes = [rand.randrange(PAGES - 1000, PAGES) for _ in range(ACCESSES)]
+    with Counter() as counter:
+        start = time.perf_counter()
+        for i in indexes:
+            with Tyf.open(path) as tif:
+                assert tif[i]["ImageDescription"] == "page %d" % i
+        elapsed = time.perf_counter() - start
+    print("%-8s %8.2f ms %8d reads %5d kB per access" % (
+        label, elapsed * 1000 / ACCESSES, counter.reads // ACCESSES,
+        counter.size // ACCESSES // 1024
+    ))
+
+
+if __name__ == "__main__":
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "pages.tif")
+        make_file(path)
+        bench(path, "no index")
+        start = time.perf_counter()
+        sidecar.build(path).close()
+        print("%-8s %8.2f ms %8d kB index" % (
+            "build", (time.perf_counter() - start) * 1000,
+            os.path.getsize(sidecar.path(path)) // 1024
+        ))
+        bench(path, "index")
+        with Tyf.open(path) as tif:
+            assert tif.index is not None, "index not used"
+    finally:
+        shutil.rmtree(folder)
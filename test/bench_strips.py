@@ -0,0 +1,104 @@
+# -*- encoding:utf-8 -*-
+"""
+Benchmark `Tyf.TiffFile.load_raster` on synthetic uncompressed files of 10,
+1k and 100k strips of 64 bytes, with merged block reads and with the
+`contiguous=True` path. Time is the best of `RUNS` runs, reads are the
+calls to the source reader (tag values included).
+
+```
+$ python test/bench_strips.py
+strips         merged    reads   contiguous    reads
+10            0.08 ms        6      0.07 ms        6
+...
+```
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Tyf  # noqa: E402
+from Tyf import ifd, source  # noqa: E402
+
+STRIP = 64
+SIZES = (10, 1000, 100000)
+RUNS = 5
+
+
+def make_file(path, strips):
+    "Write an 8-bit gray TIFF file with `strips` strips of one row."
+    template = ifd.Ifd()
+    template.set("ImageWidth", 4, STRIP)
+    template.set("ImageLength", 4, strips)
+    template.set("BitsPerSample", 3, 8)
+    template.set("SamplesPerPixel", 3, 1)
+    template.set("PhotometricInterpretation", 3, 1)
+    template.set("RowsPerStrip", 4, 1)
+    with Tyf.TiffWriter(path, template) as writer:
+        for i in range(strips):
+            writer.write_block(i, bytes([i % 251]) * STRIP)
+
+
+class Counter(object):
+    "Count `read` and `readinto` calls of `Tyf.source.File` readers."
+
+    def __init__(self):
+        self.reads = 0
+
+    def __enter__(self):
+        self.saved = source.File.read, source.File.readinto
+        read, readinto = self.saved
+
+        def counted(function):
+            def wrapper(*args):
+                self.reads += 1
+                return function(*args)
+            return wrapper
+
+        source.File.read, source.File.readinto = \
+            counted(read), counted(readinto)
+        return self
+
+    def __exit__(self, *args):
+        source.File.read, source.File.readinto = self.saved
+
+
+def bench(path, contiguous):
+    "Return best time in ms and read count of `load_raster`."
+    best = None
+    for _ in range(RUNS):
+        with Tyf.open(path) as tif:
+            with Counter() as counter:
+                start = time.perf_counter()
+                tif.load_raster(contiguous=contiguous)
+                elapsed = time.perf_counter() - start
+            stripes = tif[0].stripes
+            assert len(stripes) == len(tif[0]["StripByteCounts"])
+            assert all(
+                bytes(stripes[i]) == bytes([i % 251]) * STRIP
+                for i in (0, len(stripes) - 1)
+            ), "wrong strip data"
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, counter.reads
+
+
+if __name__ == "__main__":
+    folder = tempfile.mkdtemp()
+    try:
+        print("%-8s %12s %8s %12s %8s" % (
+            "strips", "merged", "reads", "contiguous", "reads"
+        ))
+        for strips in SIZES:
+            path = os.path.join(folder, "%d.tif" % strips)
+            make_file(path, strips)
+            merged, contiguous = bench(path, False), bench(path, True)
+            print("%-8d %9.2f ms %8d %9.2f ms %8d" % (
+                (strips, ) + merged + contiguous
+            ))
+    finally:
+        shutil.rmtree(folder)
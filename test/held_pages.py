@@ -0,0 +1,81 @@
+# -*- encoding:utf-8 -*-
+"""
+Check edits made on IFD still referenced by caller survive their eviction
+from `Tyf.TiffFile` page cache and are written by `save` and
+`update_in_place`.
+
+```
+$ python test/held_pages.py
+ok
+```
+"""
+
+import os
+import io
+import sys
+import shutil
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Tyf  # noqa: E402
+from Tyf import ifd  # noqa: E402
+
+PAGES = 20
+CACHE_SIZE = 4
+
+
+def make_file(path):
+    "Write a `PAGES` pages TIFF file repeating `test/uint16.tif` IFD."
+    with open(os.path.join(HERE, "uint16.tif"), "rb") as fileobj:
+        tif = Tyf.TiffFile(io.BytesIO(fileobj.read()))
+    tif.extend(ifd._copy(tif[0], raster=True) for _ in range(PAGES - 1))
+    tif.save(path)
+
+
+def check(path, edit, update):
+    "Edit held pages with `edit`, then save or update file in place."
+    tif = Tyf.open(path, cache_size=CACHE_SIZE)
+    # caller keeps references to edited pages
+    held, edited = edit(tif)
+    for index, key in edited:
+        assert key in tif[index], "edit of page %d lost" % index
+    if update:
+        tif.update_in_place()
+        out = path
+    else:
+        out = path + ".saved.tif"
+        tif.save(out)
+    tif.close()
+    del held
+    with Tyf.open(out) as result:
+        for index, key in edited:
+            assert result[index][key] == "x", "page %d not written" % index
+
+
+def held_page(tif):
+    page = tif[3]
+    for i in range(10):
+        tif[i]
+    page["Copyright"] = "x"
+    return page, [(3, "Copyright")]
+
+
+def held_list(tif):
+    pages = list(tif)
+    pages[7]["Artist"] = "x"
+    return pages, [(7, "Artist")]
+
+
+if __name__ == "__main__":
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "pages.tif")
+        for edit in (held_page, held_list):
+            for update in (False, True):
+                make_file(path)
+                check(path, edit, update)
+    finally:
+        shutil.rmtree(folder)
+    print("ok")
@@ -0,0 +1,46 @@
+# -*- encoding:utf-8 -*-
+"""
+Check `import Tyf` stays in its 40 ms budget: cumulative time reported by
+`python -X importtime` for `Tyf` package, median of 7 runs with compiled
+bytecode.
+
+```
+$ python test/importtime.py
+import Tyf: 18.3 ms (budget 40 ms)
+```
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+import compileall
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+BUDGET = 40000  # µs
+RUNS = 7
+
+
+def import_time():
+    "Return cumulative import time of `Tyf` package in µs."
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import Tyf"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[-1].strip() == "Tyf":
+            return int(fields[1])
+    raise RuntimeError("Tyf import time not found:\n%s" % stderr)
+
+
+if __name__ == "__main__":
+    compileall.compile_dir(os.path.join(ROOT, "Tyf"), quiet=1)
+    elapsed = statistics.median(import_time() for _ in range(RUNS))
+    print("import Tyf: %.1f ms (budget %d ms)" % (
+        elapsed / 1000, BUDGET / 1000
+    ))
+    sys.exit(elapsed > BUDGET)
@@ -0,0 +1,58 @@
+# -*- encoding:utf-8 -*-
+"""
+Check Pillow overridings are applied whatever the import order of `Tyf` and
+Pillow modules, each order being run in a new interpreter.
+
+```
+$ python test/pillow_order.py
+ok 8
+```
+"""
+
+import os
+import sys
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+IMPORTS = [
+    "import PIL.Image",
+    "from PIL import Image",
+    "import PIL.ImageFile",
+    "import PIL.JpegImagePlugin",
+]
+
+CHECK = """
+import sys
+assert "Tyf.pillow" in sys.modules, "overridings not applied"
+from PIL import Image, JpegImagePlugin
+from Tyf import pillow
+assert Image.Image is pillow.Image
+assert JpegImagePlugin.JpegImageFile._getmeta.__module__ == "Tyf.pillow"
+im = Image.open(%r)
+im._getmeta()
+assert im.ifd[0]["Make"]
+"""
+
+
+def run(code):
+    "Run `code` in a new interpreter, return error output if it failed."
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+        text=True
+    )
+    return result.stderr if result.returncode else None
+
+
+if __name__ == "__main__":
+    check = CHECK % os.path.join(HERE, "IMG_TEST_001.jpg")
+    count = 0
+    for statement in IMPORTS:
+        for code in (
+            "import Tyf\n%s\n" % statement, "%s\nimport Tyf\n" % statement
+        ):
+            error = run(code + check)
+            assert error is None, "%r failed:\n%s" % (code, error)
+            count += 1
+    print("ok", count)
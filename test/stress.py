@@ -0,0 +1,56 @@
+# -*- encoding:utf-8 -*-
+"""
+Open the sample files of this folder from 32 threads and from 32 forked
+processes, both started while tag registry is not loaded yet, and check
+every run reads the same tags as a sequential one.
+
+```
+$ python test/stress.py
+ok 352 352
+```
+"""
+
+import os
+import io
+import sys
+import glob
+import contextlib
+import multiprocessing
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Tyf  # noqa: E402
+
+WORKERS = 32
+FILES = sorted(
+    f for f in glob.glob(os.path.join(HERE, "*"))
+    if f.lower().endswith((".jpg", ".tif"))
+)
+
+
+def read_tags(path):
+    "Return file name and (tag, value) pairs of all its IFD."
+    obj = Tyf.open(path)
+    tif = obj if isinstance(obj, Tyf.TiffFile) else getattr(obj, "ifd", [])
+    return os.path.basename(path), [
+        (t.key, repr(t.value)) for i in tif for t in i.tags()
+    ]
+
+
+if __name__ == "__main__":
+    # unknown tag warnings are printed by readers, redirection is done once
+    # because it is not thread safe
+    with contextlib.redirect_stdout(io.StringIO()):
+        # forked children inherit the unloaded registry
+        ctx = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(WORKERS, mp_context=ctx) as executor:
+            forked = list(executor.map(read_tags, FILES * WORKERS))
+        with ThreadPoolExecutor(WORKERS) as executor:
+            threaded = list(executor.map(read_tags, FILES * WORKERS))
+        reference = [read_tags(f) for f in FILES]
+    assert forked == reference * WORKERS, "fork pool results differ"
+    assert threaded == reference * WORKERS, "thread pool results differ"
+    print("ok", len(threaded), len(forked))